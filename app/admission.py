@@ -0,0 +1,195 @@
+"""
+Admission control for the write-heavy routes (checkout, create-order, payment).
+
+Every one of those requests ends up waiting on the database writer, so letting
+all of them in at a peak just lengthens the queue for everyone, browse pages
+included. Each request has to pass three checks, cheapest first:
+
+- a per-user token bucket (ADMISSION_USER_RATE/BURST): one client hammering
+  the button gets 429 without taking anyone else's share;
+- a global token bucket (ADMISSION_GLOBAL_RATE/BURST): past the rate the
+  database can sustain, requests get 503 straight away;
+- a concurrency gate (ADMISSION_MAX_CONCURRENT): at most that many write
+  requests run at once; a few more (ADMISSION_MAX_QUEUE) may wait up to
+  ADMISSION_MAX_WAIT seconds for a slot, the rest get 503.
+
+Rejections carry Retry-After and cost no database work. Read-only routes never
+pass through here. Counters are exported under `admission_*` in /metrics.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from fastapi import Depends, HTTPException
+
+from .security import Principal, get_current_user
+
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "2"))
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "10"))
+ADMISSION_GLOBAL_RATE = float(os.getenv("ADMISSION_GLOBAL_RATE", "100"))
+ADMISSION_GLOBAL_BURST = float(os.getenv("ADMISSION_GLOBAL_BURST", "200"))
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "1"))
+ADMISSION_TRACKED_USERS = int(os.getenv("ADMISSION_TRACKED_USERS", "10000"))
+
+class TokenBucket:
+    """`rate` tokens per second up to `burst`; a rate of 0 or less never limits."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token; return 0 on success, else the seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def give_back(self) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+class KeyedBuckets:
+    """One TokenBucket per key, keeping the most recently used `maxsize` of them."""
+
+    def __init__(self, rate: float, burst: float, maxsize: int = ADMISSION_TRACKED_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def get(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            # A forgotten key comes back with a full bucket, which is what it would have refilled to
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class WriteAdmission:
+    """Per-user and global token buckets plus a bounded concurrency gate; used on the event loop only."""
+
+    def __init__(
+        self,
+        user_rate: float = ADMISSION_USER_RATE,
+        user_burst: float = ADMISSION_USER_BURST,
+        global_rate: float = ADMISSION_GLOBAL_RATE,
+        global_burst: float = ADMISSION_GLOBAL_BURST,
+        max_concurrent: int = ADMISSION_MAX_CONCURRENT,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        max_wait: float = ADMISSION_MAX_WAIT,
+    ):
+        self.users = KeyedBuckets(user_rate, user_burst)
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_user = 0
+        self.rejected_global = 0
+        self.rejected_busy = 0
+
+    def _take_tokens(self, user_id: int) -> None:
+        user_bucket = self.users.get(user_id)
+        wait = user_bucket.take()
+        if wait:
+            self.rejected_user += 1
+            raise Rejected(429, "Too many requests; please wait a moment and try again", wait)
+        wait = self.global_bucket.take()
+        if wait:
+            # Not this user's fault; don't charge them for it
+            user_bucket.give_back()
+            self.rejected_global += 1
+            raise Rejected(503, "We're very busy right now; please try again shortly", wait)
+
+    def _refund(self, user_id: int) -> None:
+        self.users.get(user_id).give_back()
+        self.global_bucket.give_back()
+
+    async def acquire(self, user_id: int) -> None:
+        """Admit one write request for `user_id` or raise Rejected; pair with release()."""
+        self._take_tokens(user_id)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        if self._slots.locked():
+            if self.waiting >= self.max_queue:
+                self._refund(user_id)
+                self.rejected_busy += 1
+                raise Rejected(503, "We're very busy right now; please try again shortly", self.max_wait)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self._refund(user_id)
+                self.rejected_busy += 1
+                raise Rejected(503, "We're very busy right now; please try again shortly", self.max_wait)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.in_flight += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "global_tokens": round(self.global_bucket.tokens, 3),
+            "tracked_users": len(self.users),
+            "admitted": self.admitted,
+            "rejected_user": self.rejected_user,
+            "rejected_global": self.rejected_global,
+            "rejected_busy": self.rejected_busy,
+        }
+
+write_admission = WriteAdmission()
+
+async def admit_write(user: Principal = Depends(get_current_user)):
+    """Dependency for write-heavy routes: holds a gate slot for the whole handler."""
+    try:
+        await write_admission.acquire(user.id)
+    except Rejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    try:
+        yield
+    finally:
+        write_admission.release()
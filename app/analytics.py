@@ -0,0 +1,124 @@
+"""
+Incrementally maintained daily sales summaries for the reporting API.
+
+Three tables, keyed by UTC day: units, revenue and order count per item
+(DailyItemSales) and per category (DailyCategorySales, category 0 for items
+without one), and successful / declined payments per payment method
+(DailyPaymentMethodSales). They are upserted in the transaction that completes
+the sale (a successful payment, or an order placed without a payment step),
+so a dashboard reads a handful of summary rows instead of aggregating
+orderitem, order and item.
+
+A sale counts on the day its payment was taken (the order's creation day when
+it had no payment step). rebuild_sales_summaries() recomputes every row from
+history with the same rules; scripts/backfill_reports.py runs it.
+"""
+from datetime import date
+
+from sqlalchemy import Connection, Date, func, literal, select, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .database import DIALECT
+from .models import DailyCategorySales, DailyItemSales, DailyPaymentMethodSales, Item, OrderItem, Payment
+from .summaries import NOT_COMPLETED_STATUSES
+
+if DIALECT == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert as upsert
+else:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+
+_item_sales = DailyItemSales.__table__
+_category_sales = DailyCategorySales.__table__
+_method_sales = DailyPaymentMethodSales.__table__
+_line = OrderItem.__table__
+_item = Item.__table__
+
+_SALES_COLUMNS = ("units", "revenue_cents", "orders")
+
+def _add_sales(table, key_columns: list[str], lines):
+    """INSERT ... SELECT `lines`, adding onto any existing row for the same key."""
+    stmt = upsert(table).from_select([*key_columns, *_SALES_COLUMNS], lines)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c[name] for name in key_columns],
+        set_={name: table.c[name] + stmt.excluded[name] for name in _SALES_COLUMNS},
+    )
+
+async def record_sale(session: AsyncSession, order_id: int, day: date) -> None:
+    """Add a completed order's lines to the item and category totals for `day`, before the commit."""
+    sold_on = literal(day, Date)
+    units = func.sum(_line.c.quantity)
+    revenue = func.sum(_line.c.quantity * _line.c.price_cents_each)
+    await session.execute(_add_sales(
+        _item_sales,
+        ["day", "item_id"],
+        select(sold_on, _line.c.item_id, units, revenue, literal(1))
+        .where(_line.c.order_id == order_id)
+        .group_by(_line.c.item_id),
+    ))
+    category_id = func.coalesce(_item.c.category_id, 0)
+    await session.execute(_add_sales(
+        _category_sales,
+        ["day", "category_id"],
+        select(sold_on, category_id, units, revenue, literal(1))
+        .select_from(_line.outerjoin(_item, _item.c.id == _line.c.item_id))
+        .where(_line.c.order_id == order_id)
+        .group_by(category_id),
+    ))
+
+async def record_payment_attempt(session: AsyncSession, payment: Payment) -> None:
+    """Count one payment attempt towards its method's mix for the day, before the commit."""
+    succeeded = payment.payment_status == "SUCCESS"
+    stmt = upsert(_method_sales).values(
+        day=payment.created_at.date(),
+        payment_method=payment.payment_method,
+        payments=1 if succeeded else 0,
+        amount_cents=payment.amount_cents if succeeded else 0,
+        declined=0 if succeeded else 1,
+    )
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[_method_sales.c.day, _method_sales.c.payment_method],
+        set_={
+            name: _method_sales.c[name] + stmt.excluded[name]
+            for name in ("payments", "amount_cents", "declined")
+        },
+    ))
+
+def rebuild_sales_summaries(conn: Connection) -> None:
+    """Recompute every summary row from orders and payments, inside the caller's transaction."""
+    not_completed = ", ".join(f"'{status}'" for status in NOT_COMPLETED_STATUSES)
+    sold = f"""
+        (SELECT o.id AS order_id,
+                DATE(COALESCE(
+                    (SELECT MIN(p.created_at) FROM payment p
+                     WHERE p.order_id = o.id AND p.payment_status = 'SUCCESS'),
+                    o.created_at)) AS day
+         FROM "order" o
+         WHERE o.status NOT IN ({not_completed})) s
+    """
+    for table in ("dailyitemsales", "dailycategorysales", "dailypaymentmethodsales"):
+        conn.execute(text(f"DELETE FROM {table}"))
+    conn.execute(text(f"""
+        INSERT INTO dailyitemsales (day, item_id, units, revenue_cents, orders)
+        SELECT s.day, oi.item_id, SUM(oi.quantity), SUM(oi.quantity * oi.price_cents_each), COUNT(DISTINCT oi.order_id)
+        FROM {sold}
+        JOIN orderitem oi ON oi.order_id = s.order_id
+        GROUP BY s.day, oi.item_id
+    """))
+    conn.execute(text(f"""
+        INSERT INTO dailycategorysales (day, category_id, units, revenue_cents, orders)
+        SELECT s.day, COALESCE(i.category_id, 0), SUM(oi.quantity), SUM(oi.quantity * oi.price_cents_each),
+               COUNT(DISTINCT oi.order_id)
+        FROM {sold}
+        JOIN orderitem oi ON oi.order_id = s.order_id
+        LEFT JOIN item i ON i.id = oi.item_id
+        GROUP BY s.day, COALESCE(i.category_id, 0)
+    """))
+    conn.execute(text("""
+        INSERT INTO dailypaymentmethodsales (day, payment_method, payments, amount_cents, declined)
+        SELECT DATE(p.created_at), p.payment_method,
+               SUM(CASE WHEN p.payment_status = 'SUCCESS' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN p.payment_status = 'SUCCESS' THEN p.amount_cents ELSE 0 END),
+               SUM(CASE WHEN p.payment_status = 'FAILED' THEN 1 ELSE 0 END)
+        FROM payment p
+        GROUP BY DATE(p.created_at), p.payment_method
+    """))
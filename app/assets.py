@@ -0,0 +1,155 @@
+"""
+Static asset pipeline.
+
+build_assets() copies every file under app/static into STATIC_BUILD_DIR under
+a content-hashed name (styles.css -> styles.3f2a9c1b7e0d.css), next to
+pre-compressed .gz (and .br, if the optional `brotli` package is installed)
+variants, and writes a manifest. A stamp of the sources' sizes and mtimes
+lets a worker that boots against an up-to-date build just load the manifest
+instead of hashing and copying everything again. Templates link assets through static_url(),
+so a hashed URL changes whenever the content does and can be cached forever.
+
+AssetFiles serves the build directory: hashed files get
+`Cache-Control: immutable` and the best pre-compressed variant the client
+accepts; unhashed names still work but must be revalidated.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+from pathlib import Path
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_BUILD_DIR = Path(os.getenv("STATIC_BUILD_DIR", str(Path(__file__).parent.parent / "build" / "static")))
+STATIC_URL_PREFIX = "/static/"
+MANIFEST_NAME = "manifest.json"
+STAMP_NAME = "sources.json"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_SIZE = 256
+
+_manifest: dict[str, str] = {}
+
+def _hashed_name(relative: str, digest: str) -> str:
+    stem, dot, ext = relative.rpartition(".")
+    return f"{stem}.{digest}.{ext}" if dot else f"{relative}.{digest}"
+
+def _compressible(relative: str, size: int) -> bool:
+    media_type = mimetypes.guess_type(relative)[0] or ""
+    return size >= MIN_COMPRESS_SIZE and media_type.startswith(COMPRESSIBLE_TYPES)
+
+def _write_if_missing(path: Path, data: bytes) -> None:
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+def _source_stamp(paths: list[Path], source: Path) -> dict[str, list[int]]:
+    stamp = {}
+    for path in paths:
+        stat = path.stat()
+        stamp[path.relative_to(source).as_posix()] = [stat.st_size, stat.st_mtime_ns]
+    return stamp
+
+def _load_current_manifest(target: Path, stamp: dict) -> Optional[dict[str, str]]:
+    """The existing manifest if the build in `target` was made from exactly these sources."""
+    try:
+        if json.loads((target / STAMP_NAME).read_text()) != stamp:
+            return None
+        return json.loads((target / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return None
+
+def build_assets(source: Path = STATIC_DIR, target: Path = STATIC_BUILD_DIR, force: bool = False) -> dict[str, str]:
+    """Fingerprint and pre-compress every static file; return the name -> hashed name manifest."""
+    paths = sorted(p for p in source.rglob("*") if p.is_file())
+    stamp = _source_stamp(paths, source)
+    manifest = None if force else _load_current_manifest(target, stamp)
+    if manifest is not None:
+        _manifest.clear()
+        _manifest.update(manifest)
+        return manifest
+
+    manifest = {}
+    for path in paths:
+        relative = path.relative_to(source).as_posix()
+        data = path.read_bytes()
+        hashed = _hashed_name(relative, hashlib.sha256(data).hexdigest()[:12])
+        manifest[relative] = hashed
+        # Hashed files are immutable, so an existing one is already correct
+        _write_if_missing(target / hashed, data)
+        if _compressible(relative, len(data)):
+            _write_if_missing(target / (hashed + ".gz"), gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write_if_missing(target / (hashed + ".br"), brotli.compress(data, quality=11))
+        # Unhashed copy for old links; always refreshed
+        (target / relative).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(path, target / relative)
+    (target / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    # Written last: a build interrupted before this point is redone next time
+    (target / STAMP_NAME).write_text(json.dumps(stamp, sort_keys=True))
+    _manifest.clear()
+    _manifest.update(manifest)
+    return manifest
+
+def asset_manifest() -> dict[str, str]:
+    return dict(_manifest)
+
+def static_url(name: str) -> str:
+    """URL for a static file, fingerprinted when the asset pipeline has built it."""
+    return STATIC_URL_PREFIX + _manifest.get(name, name)
+
+def accepted_encodings(headers: Headers) -> set[str]:
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if token and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(token.lower())
+    return accepted
+
+class AssetFiles(StaticFiles):
+    def __init__(self, directory: Path = STATIC_BUILD_DIR, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.hashed_names = set(_manifest.values())
+
+    def _precompressed(self, path: str, scope) -> Optional[FileResponse]:
+        accepted = accepted_encodings(Headers(scope=scope))
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accepted:
+                continue
+            full_path = os.path.join(self.directory, path + suffix)
+            if os.path.isfile(full_path):
+                return FileResponse(
+                    full_path,
+                    media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                    headers={"Content-Encoding": encoding},
+                )
+        return None
+
+    async def get_response(self, path: str, scope):
+        immutable = path in self.hashed_names
+        response = self._precompressed(path, scope) if immutable else None
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+            if immutable:
+                response.headers["Vary"] = "Accept-Encoding"
+        return response
@@ -0,0 +1,67 @@
+"""
+In-process catalog cache for the browse page.
+
+Entries are tagged with the catalog version that was current when they were
+loaded. Any write that changes stock or price calls bump_catalog_version(),
+which makes every older entry stale on its next lookup. A short TTL bounds
+staleness when several workers each hold their own copy.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "256"))
+
+_version = 0
+_version_lock = threading.Lock()
+
+def catalog_version() -> int:
+    return _version
+
+def bump_catalog_version() -> int:
+    """Invalidate every cached catalog entry. Call after stock/price writes are committed."""
+    global _version
+    with _version_lock:
+        _version += 1
+        return _version
+
+class CatalogCache:
+    def __init__(self, maxsize: int = CATALOG_CACHE_SIZE, ttl: float = CATALOG_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple[int, float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Optional[int] = None) -> Optional[Any]:
+        """Return the entry if it was stored under `version` (default: the current catalog version)."""
+        current = _version if version is None else version
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_version, stored_at, value = entry
+                if stored_version == current and (self.ttl <= 0 or time.monotonic() - stored_at < self.ttl):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, version: int) -> None:
+        """Store value loaded while `version` was current (read the version *before* querying)."""
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+catalog_cache = CatalogCache()
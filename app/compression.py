@@ -0,0 +1,150 @@
+"""
+On-the-fly gzip (or brotli) for dynamic responses.
+
+Plain ASGI and aware of streaming:
+
+- A response sent as one message (an ordinary Response) is only compressed
+  from COMPRESSION_MIN_SIZE bytes up; below that it costs more than it saves.
+- A streamed response (StreamingTemplateResponse) is compressed from its
+  first chunk, and the compressor is flushed after every chunk, so each piece
+  still reaches the browser as soon as the app sends it: the early <head>
+  flush survives compression.
+- Responses that already carry a Content-Encoding (the pre-compressed static
+  assets), event streams and non-text types pass through untouched.
+
+Brotli is preferred when the optional `brotli` package is installed and the
+client accepts it. Strong ETags are weakened on compressed responses, since
+the bytes differ from the identity representation.
+"""
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from .assets import COMPRESSIBLE_TYPES, accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Fast settings: this runs on every response, unlike the build-time static assets
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+class GzipEncoder:
+    def __init__(self, level: int = COMPRESSION_GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        compressed = self._compressor.compress(data)
+        return compressed + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else compressed
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+class BrotliEncoder:
+    def __init__(self, quality: int = COMPRESSION_BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        compressed = self._compressor.process(data)
+        return compressed + self._compressor.flush() if flush else compressed
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+ENCODERS = {"gzip": GzipEncoder}
+if brotli is not None:
+    ENCODERS = {"br": BrotliEncoder, **ENCODERS}
+
+class CompressionStats:
+    def __init__(self):
+        self.responses = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def stats(self) -> dict:
+        return {
+            "responses": self.responses,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0,
+        }
+
+compression_stats = CompressionStats()
+
+def choose_encoding(headers: Headers) -> Optional[str]:
+    accepted = accepted_encodings(headers)
+    return next((encoding for encoding in ENCODERS if encoding in accepted), None)
+
+def _compressible(status: int, headers: MutableHeaders) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "").partition(";")[0].strip()
+    return media_type.startswith(COMPRESSIBLE_TYPES) and not media_type.startswith(UNCOMPRESSED_TYPES)
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        encoding = choose_encoding(Headers(scope=scope)) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[dict] = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether the response streams
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(scope=start)
+                if not _compressible(start["status"], headers) or (not more_body and len(body) < self.min_size):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                encoder = ENCODERS[encoding]()
+                compression_stats.responses += 1
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                if not more_body:
+                    compressed = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(compressed))
+                    await send(start)
+                    await self._send_body(send, body, compressed, more_body=False)
+                    return
+                await send(start)
+
+            compressed = encoder.compress(body, flush=True) if more_body else encoder.compress(body) + encoder.finish()
+            await self._send_body(send, body, compressed, more_body)
+
+        await self.app(scope, receive, send_compressed)
+
+    async def _send_body(self, send, body: bytes, compressed: bytes, more_body: bool) -> None:
+        compression_stats.bytes_in += len(body)
+        compression_stats.bytes_out += len(compressed)
+        await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
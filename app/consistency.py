@@ -0,0 +1,51 @@
+"""
+Read-your-writes for requests routed to a read replica.
+
+A replica can lag the primary, so a client that has just changed something
+(added to the cart, placed or paid an order) could read its old state back.
+After any successful mutating request the middleware sets a short-lived
+cookie; while it is valid, get_read_session hands that client a primary
+session instead. Only installed when DATABASE_READ_URL points at a replica:
+read-only SQLite connections see every committed write immediately.
+"""
+import math
+import os
+import time
+
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+PIN_COOKIE = "primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def pinned_to_primary(request: Request) -> bool:
+    """Whether this client wrote recently enough that a replica might not have its change yet."""
+    try:
+        return float(request.cookies.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+class ReadYourWritesMiddleware:
+    """Plain ASGI: pins the client to the primary for a few seconds after it mutates something."""
+
+    def __init__(self, app, window: float = READ_YOUR_WRITES_WINDOW):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or self.window <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_pin(message):
+            # A declined payment (402) is still a write the client will want to see
+            if message["type"] == "http.response.start" and (message["status"] < 400 or message["status"] == 402):
+                until = time.time() + self.window
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{PIN_COOKIE}={until:.3f}; Max-Age={math.ceil(self.window)}; Path=/; HttpOnly; SameSite=lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_pin)
@@ -1,14 +1,200 @@
-from sqlmodel import SQLModel, create_engine
+from sqlalchemy import Engine, event, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import Session, create_engine
 import os
 
 # Import all models so SQLModel can register them
-from .models import User, Category, Item, CartItem, Order, OrderItem, Payment  # noqa: F401
+from .models import (  # noqa: F401
+    User, Category, Item, CartItem, Order, OrderItem, Payment, UserOrderSummary, InventoryReservation,
+    DailyItemSales, DailyCategorySales, DailyPaymentMethodSales,
+)
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data.db")
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+
+# An async driver in DATABASE_URL (sqlite+aiosqlite://, postgresql+asyncpg://)
+# switches request handling to an async engine. Scripts and schema setup keep
+# using a sync engine on the same database.
+ASYNC_DRIVERS = {"aiosqlite", "asyncpg", "psycopg_async"}
+
+_url = make_url(DATABASE_URL)
+ASYNC_MODE = _url.get_driver_name() in ASYNC_DRIVERS
+SYNC_DATABASE_URL = _url.set(drivername=_url.get_backend_name()) if ASYNC_MODE else _url
+DIALECT = _url.get_backend_name()
+# Optional replica for read-only handlers (see read_engine below)
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+
+# Engine profiles. "production" puts SQLite in WAL mode so readers never wait
+# on the writer, and makes writers wait for the lock instead of failing with
+# "database is locked". "legacy" keeps SQLite's defaults.
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+SQLITE_PROFILES: dict[str, dict[str, object]] = {
+    "legacy": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,  # negative = KiB, so 64 MiB per connection
+        "temp_store": "MEMORY",
+    },
+}
+# Pragmas a read-only connection can't (or needn't) set
+WRITER_PRAGMAS = {"journal_mode", "synchronous"}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+def sqlite_pragmas(profile: str = DB_PROFILE) -> dict[str, object]:
+    """Pragmas for a profile, with per-pragma overrides from SQLITE_PRAGMAS ("cache_size=-20000,mmap_size=0")."""
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {profile!r}; expected one of {sorted(SQLITE_PROFILES)}")
+    pragmas = dict(SQLITE_PROFILES[profile])
+    for override in filter(None, os.getenv("SQLITE_PRAGMAS", "").split(",")):
+        name, _, value = override.partition("=")
+        pragmas[name.strip()] = value.strip()
+    return pragmas
+
+def _is_read_only(url) -> bool:
+    return url.query.get("mode") == "ro"
+
+def _install_sqlite_pragmas(sync_engine: Engine, pragmas: dict[str, object]) -> None:
+    if not pragmas:
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+def _connection_pragmas(url, profile: str) -> dict[str, object]:
+    pragmas = sqlite_pragmas(profile)
+    if _is_read_only(url):
+        # The journal mode belongs to the file and the writer sets it
+        return {name: value for name, value in pragmas.items() if name not in WRITER_PRAGMAS}
+    return pragmas
+
+def _engine_options(url, profile: str) -> dict:
+    options: dict = {}
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            return options
+        if profile != "legacy":
+            options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+    else:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    return options
+
+def make_engine(url=SYNC_DATABASE_URL, profile: str = DB_PROFILE) -> Engine:
+    url = make_url(url)
+    sqlite = url.get_backend_name() == "sqlite"
+    sync_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if sqlite else {},
+        **_engine_options(url, profile),
+    )
+    if sqlite:
+        _install_sqlite_pragmas(sync_engine, _connection_pragmas(url, profile))
+    return sync_engine
+
+def make_async_engine(url=DATABASE_URL, profile: str = DB_PROFILE) -> AsyncEngine:
+    url = make_url(url)
+    async_db_engine = create_async_engine(url, **_engine_options(url, profile))
+    if url.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(async_db_engine.sync_engine, _connection_pragmas(url, profile))
+    return async_db_engine
+
+def read_only_sqlite_url(url):
+    """The same SQLite file opened read-only (`mode=ro`): such connections never take the write lock."""
+    url = make_url(url)
+    path = os.path.abspath(url.database)
+    return url.set(database=f"file:{path}", query={**url.query, "mode": "ro", "uri": "true"})
+
+def _read_url():
+    """Where read-only handlers connect, or None to read from the primary."""
+    if DATABASE_READ_URL:
+        # The replica is reached with the same driver as the primary
+        return make_url(DATABASE_READ_URL).set(drivername=_url.drivername)
+    if DIALECT == "sqlite" and _url.database not in (None, "", ":memory:"):
+        # Read-only connections only help when readers and the writer don't block each other
+        if str(sqlite_pragmas().get("journal_mode", "")).upper() == "WAL":
+            return read_only_sqlite_url(_url)
+    return None
+
+engine = make_engine()
+async_engine = make_async_engine() if ASYNC_MODE else None
+
+# Read routing. Browse and history pages (GET handlers in items, orders, cart
+# and the JSON API) read through read_engine: a replica when
+# DATABASE_READ_URL is set, read-only connections to the same file for SQLite
+# in WAL mode, otherwise the primary itself. Writes always use `engine`.
+READ_URL = _read_url()
+READ_ROUTING = READ_URL is not None
+if READ_ROUTING:
+    read_engine = make_engine(READ_URL.set(drivername=READ_URL.get_backend_name()) if ASYNC_MODE else READ_URL)
+    async_read_engine = make_async_engine(READ_URL) if ASYNC_MODE else None
+else:
+    read_engine, async_read_engine = engine, async_engine
+
+class BlockingSession:
+    """
+    A sync Session behind the AsyncSession interface.
+
+    Lets handlers be written once (`await session.exec(...)`) and run against
+    either engine. Calls still block the event loop, exactly as the sync mode
+    always has; use an async driver in DATABASE_URL to avoid that.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    def __getattr__(self, name):
+        # add, add_all, expunge, get_bind, ... are synchronous on AsyncSession too
+        return getattr(self.sync_session, name)
+
+    async def exec(self, *args, **kwargs):
+        return self.sync_session.exec(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return self.sync_session.execute(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return self.sync_session.scalar(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return self.sync_session.get(*args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        return self.sync_session.refresh(*args, **kwargs)
+
+    async def delete(self, instance) -> None:
+        self.sync_session.delete(instance)
+
+    async def flush(self, *args, **kwargs) -> None:
+        self.sync_session.flush(*args, **kwargs)
+
+    async def commit(self) -> None:
+        self.sync_session.commit()
+
+    async def rollback(self) -> None:
+        self.sync_session.rollback()
+
+    async def close(self) -> None:
+        self.sync_session.close()
 
 def create_db_and_tables() -> None:
-    SQLModel.metadata.create_all(engine)
+    """Bring the database schema up to date (creates it from scratch if empty)."""
+    # Imported here: migrations use modules that import this one
+    from .migrations import migrate
+
+    migrate(engine)
@@ -0,0 +1,54 @@
+"""
+Strong ETags and If-None-Match handling for server-rendered pages.
+
+An ETag here is a digest of whatever the page is built from (data versions,
+query parameters) plus a fingerprint of the templates and static assets, so a
+deploy that changes markup also changes every ETag. Handlers compute it from
+cheap queries first and return 304 before running the heavy ones or the
+template.
+"""
+import hashlib
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import Request, Response
+
+from .assets import asset_manifest
+from .templating import TEMPLATE_DIR
+
+PUBLIC_REVALIDATE = "public, no-cache"
+PRIVATE_REVALIDATE = "private, no-cache"
+
+@lru_cache(maxsize=1)
+def render_fingerprint() -> str:
+    digest = hashlib.sha1()
+    for path in sorted(TEMPLATE_DIR.rglob("*.html")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    for name, hashed in sorted(asset_manifest().items()):
+        digest.update(f"{name}={hashed}".encode())
+    return digest.hexdigest()[:12]
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(render_fingerprint().encode())
+    digest.update(repr(parts).encode())
+    return f'"{digest.hexdigest()[:24]}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+def not_modified(request: Request, etag: str, cache_control: str) -> Optional[Response]:
+    """A 304 response if the client already has this version of the page, else None."""
+    if not etag_matches(request, etag):
+        return None
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def etag_headers(etag: str, cache_control: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control}
@@ -0,0 +1,206 @@
+"""
+Live stock levels for the browse page, pushed over Server-Sent Events.
+
+Every committed stock write ends in stock_changed() (or, from a thread,
+publish_stock_levels()), which publishes {item_id: stock} for the items it
+touched to the stock feed. The feed hands each message to StockHub, which fans
+it out to this worker's SSE subscribers. A subscriber only receives the items
+it asked for, and levels published faster than it reads are merged, so a slow
+browser gets one up-to-date message rather than a backlog.
+
+The feed is in-process by default, so each uvicorn worker only sees its own
+writes. Point STOCK_EVENTS_URL at Redis (needs the optional `redis` package)
+to share one feed between workers: each publishes to a pub/sub channel and
+delivers what it hears to its own subscribers.
+"""
+import asyncio
+import logging
+import os
+from typing import Iterable, Optional
+
+import orjson
+from sqlalchemy import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .cache import bump_catalog_version
+from .models import Item
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # optional
+    redis = None
+
+STOCK_EVENTS_URL = os.getenv("STOCK_EVENTS_URL", "")
+STOCK_EVENTS_CHANNEL = os.getenv("STOCK_EVENTS_CHANNEL", "akasa:stock")
+MAX_STOCK_SUBSCRIBERS = int(os.getenv("MAX_STOCK_SUBSCRIBERS", "1000"))
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+logger = logging.getLogger(__name__)
+
+_item = Item.__table__
+
+class TooManySubscribers(Exception):
+    """This worker already streams to MAX_STOCK_SUBSCRIBERS clients."""
+
+class StockSubscription:
+    def __init__(self, item_ids: Optional[frozenset[int]]):
+        self.item_ids = item_ids
+        self.pending: dict[int, int] = {}
+        self.ready = asyncio.Event()
+
+    def offer(self, levels: dict[int, int]) -> None:
+        wanted = levels if self.item_ids is None else {k: v for k, v in levels.items() if k in self.item_ids}
+        if wanted:
+            self.pending.update(wanted)
+            self.ready.set()
+
+    async def next(self, timeout: float) -> Optional[dict[int, int]]:
+        """The levels published since the last call, or None if nothing arrived within `timeout`."""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self.ready.clear()
+        levels, self.pending = self.pending, {}
+        return levels
+
+class StockHub:
+    """Fans stock levels out to this worker's subscribers; used on the event loop only."""
+
+    def __init__(self, max_subscribers: int = MAX_STOCK_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[StockSubscription] = set()
+        self.messages = 0
+        self.rejected = 0
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def admit(self) -> None:
+        """Raise TooManySubscribers if this worker can't take another stream."""
+        if len(self._subscribers) >= self.max_subscribers:
+            self.rejected += 1
+            raise TooManySubscribers()
+
+    def subscribe(self, item_ids: Optional[Iterable[int]] = None) -> StockSubscription:
+        """Start receiving levels (for `item_ids` only, if given); pair with unsubscribe()."""
+        subscription = StockSubscription(frozenset(item_ids) if item_ids is not None else None)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StockSubscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def deliver(self, levels: dict[int, int]) -> None:
+        self.messages += 1
+        for subscription in self._subscribers:
+            subscription.offer(levels)
+
+    def stats(self) -> dict:
+        return {"subscribers": self.subscribers, "messages": self.messages, "rejected": self.rejected}
+
+class LocalStockFeed:
+    """Single worker: publishing is delivering."""
+
+    def __init__(self, hub: StockHub):
+        self.hub = hub
+
+    def listening(self) -> bool:
+        return self.hub.subscribers > 0
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, levels: dict[int, int]) -> None:
+        self.hub.deliver(levels)
+
+class RedisStockFeed:
+    """Workers share a Redis pub/sub channel; each delivers what it hears to its own subscribers."""
+
+    def __init__(self, hub: StockHub, url: str, channel: str = STOCK_EVENTS_CHANNEL):
+        if redis is None:
+            raise RuntimeError("STOCK_EVENTS_URL needs the `redis` package (pip install redis)")
+        self.hub = hub
+        self.channel = channel
+        self._client = redis.from_url(url)
+        self._listener: Optional[asyncio.Task] = None
+        self._sends: set[asyncio.Task] = set()
+
+    def listening(self) -> bool:
+        # Subscribers may be on any worker
+        return True
+
+    async def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._client.aclose()
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with self._client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            levels = orjson.loads(message["data"])
+                            self.hub.deliver({int(item_id): stock for item_id, stock in levels.items()})
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Stock feed connection lost; resubscribing")
+                await asyncio.sleep(1)
+
+    def publish(self, levels: dict[int, int]) -> None:
+        send = asyncio.ensure_future(self._client.publish(self.channel, orjson.dumps(levels, option=orjson.OPT_NON_STR_KEYS)))
+        self._sends.add(send)
+        send.add_done_callback(self._sends.discard)
+
+stock_hub = StockHub()
+stock_feed = RedisStockFeed(stock_hub, STOCK_EVENTS_URL) if STOCK_EVENTS_URL else LocalStockFeed(stock_hub)
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+async def start_stock_feed() -> None:
+    global _loop
+    _loop = asyncio.get_running_loop()
+    await stock_feed.start()
+
+async def stop_stock_feed() -> None:
+    global _loop
+    await stock_feed.stop()
+    _loop = None
+
+def wants_stock_levels() -> bool:
+    """Whether anyone could receive published levels (lets writers skip the lookup)."""
+    return _loop is not None and stock_feed.listening()
+
+def publish_stock_levels(levels: dict[int, int]) -> None:
+    """Publish committed stock levels; safe to call from any thread, a no-op when the app isn't serving."""
+    if levels and _loop is not None:
+        _loop.call_soon_threadsafe(stock_feed.publish, dict(levels))
+
+async def stock_changed(session: AsyncSession, item_ids: Iterable[int]) -> None:
+    """
+    Call after committing a stock write: invalidates cached catalog pages and
+    publishes the items' new levels (one primary-key lookup, skipped while
+    nobody is listening).
+    """
+    bump_catalog_version()
+    if not wants_stock_levels():
+        return
+    ids = sorted(set(item_ids))
+    if ids:
+        rows = await session.execute(select(_item.c.id, _item.c.stock).where(_item.c.id.in_(ids)))
+        publish_stock_levels(dict(rows.all()))
@@ -0,0 +1,135 @@
+"""
+Stock reservation and order placement.
+
+Stock is taken with one conditional update for the whole cart
+(`UPDATE item SET stock = stock - q(id) WHERE id IN (...) AND stock >= q(id)
+RETURNING id`, q being a CASE over the cart lines) so two concurrent checkouts
+can never both take the last unit, and the whole order
+(stock, order row, order lines, cart cleanup) is written in one transaction.
+"""
+from collections import Counter
+from typing import Iterable, Optional
+from uuid import uuid4
+
+from sqlalchemy import case, delete, insert, update
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .analytics import record_sale
+from .events import stock_changed
+from .models import CartItem, Item, Order, OrderItem
+from .reservations import record_holds, release_pending_orders
+from .summaries import NOT_COMPLETED_STATUSES, record_order_completed, record_order_placed
+
+class OutOfStock(Exception):
+    def __init__(self, names: list[str]):
+        super().__init__(f"Not Available: {', '.join(names)}")
+        self.names = names
+
+_item = Item.__table__
+
+def _take_stock(wanted: Counter):
+    # One statement with RETURNING rather than an executemany: drivers such as
+    # asyncpg and psycopg2 don't report a rowcount for executemany
+    qty = case(dict(wanted), value=_item.c.id)
+    return (
+        update(_item)
+        .where(_item.c.id.in_(list(wanted)), _item.c.stock >= qty)
+        .values(stock=_item.c.stock - qty)
+        .returning(_item.c.id)
+    )
+
+async def reserve_stock(session: AsyncSession, lines: Iterable[tuple[int, int]]) -> None:
+    """
+    Decrement stock for every (item_id, quantity) line inside the current transaction.
+
+    Raises OutOfStock (after rolling back) if any line cannot be covered; the
+    caller commits on success.
+    """
+    wanted = Counter()
+    for item_id, qty in lines:
+        wanted[item_id] += qty
+    if not wanted:
+        return
+    taken = (await session.execute(_take_stock(wanted))).scalars().all()
+    if len(taken) == len(wanted):
+        return
+    await session.rollback()
+    rows = (await session.exec(select(Item.id, Item.name, Item.stock).where(Item.id.in_(list(wanted))))).all()
+    found = {row.id: row for row in rows}
+    names = []
+    for item_id, qty in wanted.items():
+        row = found.get(item_id)
+        if row is None:
+            names.append(f"Item {item_id}")
+        elif row.stock < qty:
+            names.append(row.name)
+    raise OutOfStock(names or [f"Item {item_id}" for item_id in wanted])
+
+async def place_order_from_cart(
+    session: AsyncSession,
+    user_id: int,
+    *,
+    status: str,
+    payment_status: str = "PENDING",
+    take_stock: bool = True,
+    clear_cart: bool = True,
+    hold_ttl: Optional[float] = None,
+) -> Optional[Order]:
+    """
+    Turn the user's cart into an order with a single commit.
+
+    With `hold_ttl`, the stock taken is recorded as holds that lapse after
+    that many seconds unless the order is paid (see app.reservations), and
+    the user's earlier unpaid orders are expired first, returning their stock.
+    Returns None if the cart is empty. Raises OutOfStock if stock is checked
+    (`take_stock`) and any line is short.
+    """
+    cart_items = (await session.exec(
+        select(CartItem).where(CartItem.user_id == user_id).options(joinedload(CartItem.item))
+    )).all()
+    if not cart_items:
+        return None
+    missing = [f"Item {ci.item_id}" for ci in cart_items if ci.item is None]
+    if missing:
+        raise OutOfStock(missing)
+    released: list[int] = []
+    if take_stock and hold_ttl is not None:
+        # A re-submitted checkout replaces the user's earlier unpaid order rather than competing with its holds
+        released = await release_pending_orders(session, user_id)
+    if take_stock:
+        await reserve_stock(session, [(ci.item_id, ci.quantity) for ci in cart_items])
+    else:
+        short = [ci.item.name for ci in cart_items if ci.item.stock < ci.quantity]
+        if short:
+            raise OutOfStock(short)
+
+    order = Order(
+        user_id=user_id,
+        status=status,
+        tracking_id=str(uuid4()),
+        payment_status=payment_status,
+        total_cents=sum(ci.item.price_cents * ci.quantity for ci in cart_items),
+    )
+    session.add(order)
+    await session.flush()
+    await session.execute(
+        insert(OrderItem),
+        [
+            {"order_id": order.id, "item_id": ci.item_id, "quantity": ci.quantity, "price_cents_each": ci.item.price_cents}
+            for ci in cart_items
+        ],
+    )
+    if take_stock and hold_ttl is not None:
+        await record_holds(session, order.id, [(ci.item_id, ci.quantity) for ci in cart_items], hold_ttl)
+    if clear_cart:
+        await session.execute(delete(CartItem).where(CartItem.id.in_([ci.id for ci in cart_items])))
+    await record_order_placed(session, order)
+    if status not in NOT_COMPLETED_STATUSES:
+        await record_order_completed(session, order)
+        await record_sale(session, order.id, order.created_at.date())
+    await session.commit()
+    if take_stock:
+        await stock_changed(session, [ci.item_id for ci in cart_items] + released)
+    return order
@@ -0,0 +1,357 @@
+"""
+Bulk inventory import and export (CSV or JSON Lines).
+
+Import reads records one at a time and applies them in batches of
+IMPORT_BATCH_SIZE, one transaction per batch, so a feed of any size needs
+neither much memory nor one long write lock. Each record is matched by `sku`
+when it has one, else by `name`. A sku that matches nothing falls back to an
+item of exactly that name which has no sku yet, and gives it the sku, so the
+first sku feed against older items doesn't duplicate them. Matched items get
+the fields the record sets; unknown ones are created (which needs a name).
+
+Feed stock is stock on hand. Item.stock is what can still be sold, so units
+held for unpaid orders (app.reservations) are subtracted when it is written,
+inside the UPDATE; when a hold lapses and its units are returned, the total
+comes back to the feed's figure. Export writes stock on hand the same way, so
+an exported file imports back unchanged.
+
+Stock and price go out as one executemany UPDATE per batch; name and
+description get their own, only for the rows whose text changed, so a
+stock-and-price feed never touches the search index. Invalid records are
+reported with their line number and skipped; they never abort the import.
+Each committed batch invalidates cached catalog pages and publishes the new
+stock levels (app.events.stock_changed).
+
+Export walks the catalog by id in pages of EXPORT_PAGE_SIZE and yields text
+as it goes, in the same columns the import accepts.
+"""
+import csv
+import heapq
+import io
+import os
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterable, Iterator, Optional, TextIO, Union
+
+import orjson
+from sqlalchemy import bindparam, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .events import stock_changed
+from .models import Category, InventoryReservation, Item
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ("csv", "jsonl")
+COLUMNS = ("id", "sku", "name", "category", "price_cents", "stock", "description")
+
+_item = Item.__table__
+_category = Category.__table__
+_hold = InventoryReservation.__table__
+
+# Units held for unpaid orders, per item (through the holds' item_id index)
+_held = (
+    select(func.coalesce(func.sum(_hold.c.quantity), 0))
+    .where(_hold.c.item_id == _item.c.id)
+    .scalar_subquery()
+)
+
+_set_stock_and_price = (
+    update(_item)
+    .where(_item.c.id == bindparam("item_id"))
+    .values(
+        stock=bindparam("on_hand") - _held,
+        price_cents=bindparam("price_cents"),
+        category_id=bindparam("category_id"),
+        sku=bindparam("sku"),
+    )
+)
+_set_text = (
+    update(_item)
+    .where(_item.c.id == bindparam("item_id"))
+    .values(name=bindparam("name"), description=bindparam("description"))
+)
+
+class RowError(ValueError):
+    """A record that can't be applied; reported with its line number and skipped."""
+
+@dataclass
+class ImportRow:
+    line: int
+    sku: Optional[str]
+    name: Optional[str]
+    # Only the fields the record sets: stock, price_cents, description, category_id
+    values: dict
+
+    def keys(self) -> set[tuple[str, str]]:
+        return {("sku", self.sku)} if self.sku else {("name", self.name)}
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    batches: int = 0
+    # The MAX_REPORTED_ERRORS lowest-numbered failures, as a max-heap of (-line, order, message):
+    # records failing when their batch is applied are reported after later lines that failed to parse
+    _errors: list[tuple[int, int, str]] = field(default_factory=list)
+
+    def error(self, line: int, message: str) -> None:
+        self.failed += 1
+        entry = (-line, -self.failed, message)
+        if len(self._errors) < MAX_REPORTED_ERRORS:
+            heapq.heappush(self._errors, entry)
+        elif entry > self._errors[0]:
+            heapq.heapreplace(self._errors, entry)
+
+    @property
+    def errors(self) -> list[dict]:
+        """Failures in line order."""
+        return [{"line": -line, "error": message} for line, _, message in sorted(self._errors, reverse=True)]
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self._errors),
+        }
+
+Record = Union[dict, RowError]
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[tuple[int, Record]]:
+    """(line number, record) for each CSV row or JSON line; unreadable ones come back as RowError."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield reader.line_num, RowError(f"Malformed CSV: {e}")
+                continue
+            if None in record:
+                yield reader.line_num, RowError("More fields than the header has")
+            else:
+                yield reader.line_num, record
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                yield number, RowError(f"Malformed JSON: {e}")
+                continue
+            yield number, record if isinstance(record, dict) else RowError("Each line must be a JSON object")
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+def _text(record: dict, name: str) -> Optional[str]:
+    value = record.get(name)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def _count(record: dict, name: str) -> Optional[int]:
+    value = record.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        number = int(value) if not isinstance(value, (bool, float)) else None
+    except ValueError:
+        number = None
+    if number is None or number < 0:
+        raise RowError(f"{name} must be a whole number >= 0, got {value!r}")
+    return number
+
+def parse_record(line: int, record: dict, categories: dict[str, int]) -> ImportRow:
+    """Validate one record; raise RowError with a message meant for whoever prepared the feed."""
+    record = {str(key).strip().lower(): value for key, value in record.items()}
+    sku, name = _text(record, "sku"), _text(record, "name")
+    if not sku and not name:
+        raise RowError("Needs a sku or a name")
+    values = {}
+    for column in ("stock", "price_cents"):
+        number = _count(record, column)
+        if number is not None:
+            values[column] = number
+    if record.get("description") not in (None, ""):
+        values["description"] = str(record["description"])
+    category = _text(record, "category")
+    if category is not None:
+        if category not in categories:
+            raise RowError(f"Unknown category {category!r}")
+        values["category_id"] = categories[category]
+    return ImportRow(line=line, sku=sku, name=name, values=values)
+
+async def _apply_batch(session: AsyncSession, rows: list[ImportRow], report: ImportReport) -> None:
+    # Two indexed lookups rather than one `sku IN (...) OR name IN (...)`, which
+    # SQLite may plan as a table scan; names only for rows the skus missed
+    skus = [row.sku for row in rows if row.sku]
+    existing = (await session.execute(select(_item).where(_item.c.sku.in_(skus)))).mappings().all() if skus else []
+    found = {item["sku"] for item in existing}
+    names = [row.name for row in rows if row.name and row.sku not in found]
+    if names:
+        seen = {item["id"] for item in existing}
+        existing += [
+            item for item in (await session.execute(select(_item).where(_item.c.name.in_(names)))).mappings()
+            if item["id"] not in seen
+        ]
+    by_sku = {item["sku"]: item for item in existing if item["sku"] is not None}
+    by_name: dict[str, list] = {}
+    for item in existing:
+        by_name.setdefault(item["name"], []).append(item)
+    held = dict((await session.execute(
+        select(_hold.c.item_id, func.sum(_hold.c.quantity))
+        .where(_hold.c.item_id.in_([item["id"] for item in existing]))
+        .group_by(_hold.c.item_id)
+    )).all()) if existing else {}
+
+    stock_and_price, text_changes, new_items, failed = [], [], [], []
+    unchanged = 0
+    for row in rows:
+        current = by_sku.get(row.sku) if row.sku else None
+        if current is None and row.name:
+            matches = by_name.get(row.name, [])
+            if row.sku:
+                # Only an item nobody has given a sku yet can take this one
+                matches = [item for item in matches if item["sku"] is None]
+            if len(matches) > 1:
+                failed.append((row.line, f"{len(matches)} items are named {row.name!r}; match them by sku"))
+                continue
+            current = matches[0] if matches else None
+        if current is None:
+            if not row.name:
+                failed.append((row.line, f"No item with sku {row.sku!r}, and a new item needs a name"))
+                continue
+            new_items.append({
+                "sku": row.sku,
+                "name": row.name,
+                "description": row.values.get("description", ""),
+                "price_cents": row.values.get("price_cents", 0),
+                "stock": row.values.get("stock", 0),
+                "category_id": row.values.get("category_id"),
+            })
+            continue
+        current = {**current, "stock": current["stock"] + held.get(current["id"], 0)}
+        wanted = {**current, **row.values, "name": row.name or current["name"], "sku": row.sku or current["sku"]}
+        changed = False
+        if any(wanted[column] != current[column] for column in ("stock", "price_cents", "category_id", "sku")):
+            stock_and_price.append({
+                "item_id": current["id"],
+                "on_hand": wanted["stock"],
+                "price_cents": wanted["price_cents"],
+                "category_id": wanted["category_id"],
+                "sku": wanted["sku"],
+            })
+            changed = True
+        if any(wanted[column] != current[column] for column in ("name", "description")):
+            text_changes.append({"item_id": current["id"], "name": wanted["name"], "description": wanted["description"]})
+            changed = True
+        unchanged += not changed
+
+    if stock_and_price:
+        await session.execute(_set_stock_and_price, stock_and_price)
+    if text_changes:
+        await session.execute(_set_text, text_changes)
+    if new_items:
+        await session.execute(insert(_item), new_items)
+    await session.commit()
+
+    report.batches += 1
+    report.created += len(new_items)
+    report.updated += len({params["item_id"] for params in stock_and_price + text_changes})
+    report.unchanged += unchanged
+    for line, message in failed:
+        report.error(line, message)
+    if stock_and_price or text_changes or new_items:
+        await stock_changed(session, [params["item_id"] for params in stock_and_price])
+
+async def _apply(session: AsyncSession, rows: list[ImportRow], report: ImportReport) -> None:
+    try:
+        await _apply_batch(session, rows, report)
+    except IntegrityError as e:
+        # Someone else wrote one of these keys meanwhile: retry row by row to find it
+        await session.rollback()
+        if len(rows) == 1:
+            report.error(rows[0].line, f"Rejected by the database: {e.orig}")
+            return
+        for row in rows:
+            await _apply(session, [row], report)
+
+async def import_inventory(
+    session: AsyncSession,
+    records: Iterable[tuple[int, Record]],
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> ImportReport:
+    """Apply `records` (from read_records) in batches of `batch_size`, one commit each."""
+    report = ImportReport()
+    categories = dict((await session.execute(select(_category.c.name, _category.c.id))).all())
+    batch: list[ImportRow] = []
+    keys: set[tuple[str, str]] = set()
+    for line, record in records:
+        report.rows += 1
+        try:
+            if isinstance(record, RowError):
+                raise record
+            row = parse_record(line, record, categories)
+        except RowError as e:
+            report.error(line, str(e))
+            continue
+        # A key seen earlier in this batch must be written before it is looked up again
+        if len(batch) >= batch_size or keys & row.keys():
+            await _apply(session, batch, report)
+            batch, keys = [], set()
+        batch.append(row)
+        keys |= row.keys()
+        if row.name:
+            keys.add(("name", row.name))
+    if batch:
+        await _apply(session, batch, report)
+    return report
+
+def _format(rows: list[dict], fmt: str, header: bool) -> str:
+    if fmt == "jsonl":
+        return "".join(orjson.dumps(row).decode() + "\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS, lineterminator="\n")
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+async def export_inventory(session: AsyncSession, fmt: str, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[str]:
+    """The whole catalog in `fmt`, one chunk of text per page of items."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    page = (
+        select(
+            _item.c.id, _item.c.sku, _item.c.name, _category.c.name.label("category"),
+            _item.c.price_cents, (_item.c.stock + _held).label("stock"), _item.c.description,
+        )
+        .select_from(_item.outerjoin(_category, _category.c.id == _item.c.category_id))
+        .order_by(_item.c.id)
+        .limit(page_size)
+    )
+    after = 0
+    first = True
+    while True:
+        rows = [dict(row) for row in (await session.execute(page.where(_item.c.id > after))).mappings()]
+        if not rows and not first:
+            return
+        yield _format(rows, fmt, header=first)
+        if len(rows) < page_size:
+            return
+        first = False
+        after = rows[-1]["id"]
@@ -1,11 +1,22 @@
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi import Depends, FastAPI, Request
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 
-from .routers import auth, items, cart, orders, payment
-from .database import create_db_and_tables
+from . import metrics
+from .routers import api, auth, items, cart, inventory, orders, payment, reports
+from .assets import AssetFiles, build_assets
+from .admission import write_admission
+from .cache import catalog_cache
+from .compression import CompressionMiddleware, compression_stats
+from .events import start_stock_feed, stock_hub, stop_stock_feed
+from .consistency import ReadYourWritesMiddleware
+from .database import DATABASE_READ_URL, READ_ROUTING, async_engine, async_read_engine, engine, read_engine
+from .migrations import ensure_schema
+from .metrics import InstrumentationMiddleware, instrument_engine, register_collector
+from .templating import fragment_cache, templates
+from .password_pool import password_pool
+from .reservations import RESERVATION_SWEEPER, reservation_sweeper
+from .security import require_admin
 
 app = FastAPI(title="Akasa Food Ordering Platform")
 
@@ -17,23 +28,71 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        response.headers.setdefault("X-Content-Type-Options", "nosniff")
-        response.headers.setdefault("X-Frame-Options", "DENY")
-        response.headers.setdefault("Referrer-Policy", "strict-origin-when-cross-origin")
-        response.headers.setdefault("Content-Security-Policy", "default-src 'self'; img-src 'self' data:; style-src 'self' 'unsafe-inline'")
-        return response
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Content-Security-Policy": "default-src 'self'; img-src 'self' data:; style-src 'self' 'unsafe-inline'",
+}
+
+class SecurityHeadersMiddleware:
+    """Plain ASGI: adds headers to the response start message without buffering the body."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in SECURITY_HEADERS.items():
+                    headers.setdefault(name, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
 
 app.add_middleware(SecurityHeadersMiddleware)
+if DATABASE_READ_URL:
+    app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(CompressionMiddleware)
+# Added last so it is outermost and times the whole stack
+app.add_middleware(InstrumentationMiddleware)
+
+instrument_engine(engine)
+if async_engine is not None:
+    instrument_engine(async_engine.sync_engine)
+if READ_ROUTING:
+    instrument_engine(read_engine)
+    if async_read_engine is not None:
+        instrument_engine(async_read_engine.sync_engine)
+register_collector("password_pool", password_pool.stats)
+register_collector("admission", write_admission.stats)
+register_collector("catalog_cache", lambda: {"hits": catalog_cache.hits, "misses": catalog_cache.misses})
+register_collector("reservations", reservation_sweeper.stats)
+register_collector("stock_events", stock_hub.stats)
+register_collector("compression", compression_stats.stats)
+register_collector("fragment_cache", lambda: {"hits": fragment_cache.hits, "misses": fragment_cache.misses})
 
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
-templates = Jinja2Templates(directory="app/templates")
+build_assets()
+app.mount("/static", AssetFiles(), name="static")
 
 @app.on_event("startup")
 async def on_startup() -> None:
-    create_db_and_tables()
+    # One version query on a current database; migrates only when behind
+    ensure_schema(engine)
+    await start_stock_feed()
+    if RESERVATION_SWEEPER:
+        reservation_sweeper.start()
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await reservation_sweeper.stop()
+    await stop_stock_feed()
+    password_pool.shutdown()
 
 @app.get("/")
 async def home(request: Request):
@@ -44,3 +103,8 @@ app.include_router(items.router, prefix="/items", tags=["items"])
 app.include_router(cart.router, prefix="/cart", tags=["cart"])
 app.include_router(orders.router, prefix="/orders", tags=["orders"])
 app.include_router(payment.router, prefix="/payment", tags=["payment"])
+app.include_router(api.router, prefix="/api/v1", tags=["api"])
+app.include_router(reports.router, prefix="/reports", tags=["reports"])
+app.include_router(inventory.router, prefix="/inventory", tags=["inventory"])
+# Operator endpoint like /reports; guarded here since app.security itself imports app.metrics
+app.include_router(metrics.router, dependencies=[Depends(require_admin)])
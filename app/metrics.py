@@ -0,0 +1,159 @@
+"""
+Request instrumentation: per-route latency histograms, phase timing,
+Server-Timing headers and a Prometheus text endpoint (behind ADMIN_TOKEN).
+
+Each request gets a phase dict in a context variable. Code that wants its time
+accounted wraps itself in `phase_timer("name")`; SQL statements are timed
+automatically into the "db" phase through engine events. Phases can nest (the
+auth phase includes its DB lookup), so they are not meant to add up to the
+total.
+
+Everything is plain ASGI and in-process counters, cheap enough to leave on in
+production.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import Engine, event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_phases: ContextVar[Optional[dict[str, float]]] = ContextVar("request_phases", default=None)
+
+class Histogram:
+    def __init__(self, name: str, help: str, label_names: tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [bucket counts..., +Inf count, sum]
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status")
+)
+phase_latency = Histogram(
+    "http_request_phase_seconds", "Time spent per request phase (db, template, auth)", ("route", "phase")
+)
+
+# Extra gauges/counters contributed by other modules: name -> callable returning {metric: value}
+_collectors: dict[str, Callable[[], dict[str, float]]] = {}
+
+def register_collector(name: str, collect: Callable[[], dict[str, float]]) -> None:
+    _collectors[name] = collect
+
+def record_phase(name: str, seconds: float) -> None:
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+@contextmanager
+def phase_timer(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_phase(name, time.perf_counter() - started)
+
+def instrument_engine(engine: Engine) -> None:
+    """Count every statement's execution time into the current request's "db" phase."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        conn.info["query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = conn.info.pop("query_started", None)
+        if started is not None:
+            record_phase("db", time.perf_counter() - started)
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path", "unmatched")
+    if scope.get("root_path") and scope.get("app_root_path") is not None:
+        return scope["root_path"]  # mounted app such as /static
+    return "unmatched"
+
+class InstrumentationMiddleware:
+    """Times each HTTP request, adds a Server-Timing header and feeds the histograms."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        phases: dict[str, float] = {}
+        token = _phases.set(phases)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timings = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases.items()]
+                timings.append(f"app;dur={(time.perf_counter() - started) * 1000:.1f}")
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", ", ".join(timings).encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _phases.reset(token)
+            route = _route_label(scope)
+            request_latency.observe((scope["method"], route, str(status_code)), time.perf_counter() - started)
+            for name, seconds in phases.items():
+                phase_latency.observe((route, name), seconds)
+
+def render_metrics() -> str:
+    lines = request_latency.render() + phase_latency.render()
+    for collector_name, collect in sorted(_collectors.items()):
+        for metric, value in sorted(collect().items()):
+            full_name = f"{collector_name}_{metric}"
+            lines.append(f"# TYPE {full_name} gauge")
+            lines.append(f"{full_name} {value}")
+    return "\n".join(lines) + "\n"
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
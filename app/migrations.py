@@ -0,0 +1,154 @@
+"""
+Versioned, in-place schema migrations.
+
+Each migration runs in its own transaction together with the row that records
+it in `schema_migrations`, so an interrupted upgrade resumes where it stopped.
+On SQLite the transaction is opened with BEGIN IMMEDIATE, which serialises
+workers that boot at the same time; the loser re-reads the version and skips
+what is already applied. Migrations only add (tables, columns, indexes), so
+they are safe to run against a live database.
+
+Workers don't run migrate() on every boot: ensure_schema() reads the stored
+version with one query and takes the write lock only when something is
+actually pending (or, with SCHEMA_ON_STARTUP=check, refuses to start so a
+deploy step can own migrations).
+
+Add a new migration by appending to MIGRATIONS with the next version number.
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import Connection, Engine, inspect, text
+from sqlmodel import SQLModel
+
+from .analytics import rebuild_sales_summaries
+from .models import DailyCategorySales, DailyItemSales, DailyPaymentMethodSales, InventoryReservation, UserOrderSummary
+from .search import ensure_item_search_index
+from .summaries import backfill_order_summaries
+
+SCHEMA_ON_STARTUP = os.getenv("SCHEMA_ON_STARTUP", "migrate")  # migrate | check
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl: str) -> None:
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f'ALTER TABLE "{table}" ADD COLUMN {ddl}'))
+
+def _baseline(conn: Connection) -> None:
+    # Databases created before payments were added lack these
+    SQLModel.metadata.create_all(conn)
+    _add_column_if_missing(conn, "order", "payment_status", "payment_status VARCHAR NOT NULL DEFAULT 'PENDING'")
+
+def _item_search(conn: Connection) -> None:
+    ensure_item_search_index(conn)
+
+HOT_PATH_INDEXES = {
+    "ix_cartitem_user_id_item_id": ("cartitem", ("user_id", "item_id")),
+    "ix_order_user_id_created_at": ("order", ("user_id", "created_at")),
+    "ix_payment_order_id_created_at": ("payment", ("order_id", "created_at")),
+    "ix_orderitem_order_id": ("orderitem", ("order_id",)),
+    "ix_item_category_id_name": ("item", ("category_id", "name")),
+}
+
+def _hot_path_indexes(conn: Connection) -> None:
+    for name, (table, columns) in HOT_PATH_INDEXES.items():
+        cols = ", ".join(columns)
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({cols})'))
+
+def _order_summaries(conn: Connection) -> None:
+    SQLModel.metadata.create_all(conn, tables=[UserOrderSummary.__table__])
+    backfill_order_summaries(conn)
+
+def _inventory_reservations(conn: Connection) -> None:
+    SQLModel.metadata.create_all(conn, tables=[InventoryReservation.__table__])
+
+def _sales_summaries(conn: Connection) -> None:
+    SQLModel.metadata.create_all(
+        conn, tables=[DailyItemSales.__table__, DailyCategorySales.__table__, DailyPaymentMethodSales.__table__]
+    )
+    rebuild_sales_summaries(conn)
+
+def _item_sku(conn: Connection) -> None:
+    _add_column_if_missing(conn, "item", "sku", "sku VARCHAR")
+    conn.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_item_sku ON "item" (sku)'))
+
+def _reservation_item_index(conn: Connection) -> None:
+    # Bulk imports subtract each item's held units from feed stock
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_inventoryreservation_item_id ON inventoryreservation (item_id)"))
+
+def _item_sku_partial_index(conn: Connection) -> None:
+    # Index only the items that have a sku: with every legacy sku NULL, ANALYZE
+    # rated the full index as matching the whole table and lookups scanned it
+    conn.execute(text("DROP INDEX IF EXISTS ix_item_sku"))
+    conn.execute(text('CREATE UNIQUE INDEX ix_item_sku ON "item" (sku) WHERE sku IS NOT NULL'))
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "baseline", _baseline),
+    Migration(2, "item_search", _item_search),
+    Migration(3, "hot_path_indexes", _hot_path_indexes),
+    Migration(4, "order_summaries", _order_summaries),
+    Migration(5, "inventory_reservations", _inventory_reservations),
+    Migration(6, "sales_summaries", _sales_summaries),
+    Migration(7, "item_sku", _item_sku),
+    Migration(8, "reservation_item_index", _reservation_item_index),
+    Migration(9, "item_sku_partial_index", _item_sku_partial_index),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+_VERSION_TABLE_DDL = (
+    "CREATE TABLE IF NOT EXISTS schema_migrations ("
+    "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at TIMESTAMP NOT NULL)"
+)
+
+def current_version(conn: Connection) -> int:
+    try:
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar_one()
+    except Exception:
+        conn.rollback()
+        return 0
+
+def pending_migrations(engine: Engine) -> list[Migration]:
+    with engine.connect() as conn:
+        version = current_version(conn)
+    return [m for m in MIGRATIONS if m.version > version]
+
+def migrate(engine: Engine, target: int = LATEST_VERSION) -> list[Migration]:
+    """Apply every migration up to `target`; return the ones applied by this call."""
+    applied: list[Migration] = []
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.execute(text(_VERSION_TABLE_DDL))
+        for migration in MIGRATIONS:
+            if migration.version > target:
+                break
+            with conn.begin():
+                if conn.dialect.name == "sqlite":
+                    conn.exec_driver_sql("BEGIN IMMEDIATE")
+                if current_version(conn) >= migration.version:
+                    continue
+                migration.apply(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                    {"v": migration.version, "n": migration.name, "t": datetime.utcnow()},
+                )
+            applied.append(migration)
+    return applied
+
+def ensure_schema(engine: Engine, mode: str = SCHEMA_ON_STARTUP) -> list[Migration]:
+    """Startup preflight: one read when the schema is current; otherwise migrate (or fail, in "check" mode)."""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version >= LATEST_VERSION:
+        return []
+    if mode == "check":
+        raise RuntimeError(
+            f"Database schema is at version {version}, this build needs {LATEST_VERSION}; run scripts/migrate.py"
+        )
+    return migrate(engine)
@@ -1,5 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 
 class User(SQLModel, table=True):
@@ -18,8 +19,18 @@ class Category(SQLModel, table=True):
     items: list["Item"] = Relationship(back_populates="category")
 
 class Item(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_item_category_id_name", "category_id", "name"),
+        # Partial, so the mostly-NULL skus of a legacy catalog don't make ANALYZE rate it useless
+        Index(
+            "ix_item_sku", "sku", unique=True,
+            sqlite_where=text("sku IS NOT NULL"), postgresql_where=text("sku IS NOT NULL"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
+    sku: Optional[str] = None  # supplier stock-keeping unit, the key for bulk imports
     description: str = ""
     price_cents: int = 0
     stock: int = 0
@@ -30,6 +41,8 @@ class Item(SQLModel, table=True):
     order_items: list["OrderItem"] = Relationship(back_populates="item")
 
 class CartItem(SQLModel, table=True):
+    __table_args__ = (Index("ix_cartitem_user_id_item_id", "user_id", "item_id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     item_id: int = Field(foreign_key="item.id")
@@ -40,11 +53,13 @@ class CartItem(SQLModel, table=True):
     item: Optional[Item] = Relationship(back_populates="cart_items")
 
 class Order(SQLModel, table=True):
+    __table_args__ = (Index("ix_order_user_id_created_at", "user_id", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     total_cents: int = 0
-    status: str = "PLACED"  # PLACED, SHIPPED, DELIVERED, CANCELLED
+    status: str = "PLACED"  # PENDING_PAYMENT, PLACED, SHIPPED, DELIVERED, CANCELLED, EXPIRED
     tracking_id: str = ""
     payment_status: str = "PENDING"  # PENDING, PAID, FAILED, REFUNDED
 
@@ -53,6 +68,8 @@ class Order(SQLModel, table=True):
     payments: list["Payment"] = Relationship(back_populates="order")
 
 class Payment(SQLModel, table=True):
+    __table_args__ = (Index("ix_payment_order_id_created_at", "order_id", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     order_id: int = Field(foreign_key="order.id")
     amount_cents: int = 0
@@ -66,10 +83,51 @@ class Payment(SQLModel, table=True):
 
 class OrderItem(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="order.id")
+    order_id: int = Field(foreign_key="order.id", index=True)
     item_id: int = Field(foreign_key="item.id")
     quantity: int
     price_cents_each: int
 
     order: Optional[Order] = Relationship(back_populates="items")
     item: Optional[Item] = Relationship(back_populates="order_items")
+
+class UserOrderSummary(SQLModel, table=True):
+    # Maintained incrementally by app.summaries; revision changes whenever the order list does
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    order_count: int = 0  # completed (paid or placed) orders
+    lifetime_spend_cents: int = 0
+    last_order_id: Optional[int] = None
+    last_order_at: Optional[datetime] = None
+    revision: int = 0
+
+class InventoryReservation(SQLModel, table=True):
+    # Stock held for an unpaid order line until expires_at (see app.reservations)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    order_id: int = Field(foreign_key="order.id", index=True)
+    item_id: int = Field(foreign_key="item.id", index=True)
+    quantity: int
+    expires_at: datetime = Field(index=True)
+
+# Sales summaries, maintained incrementally by app.analytics in the transaction
+# that completes each sale; rebuilt from history by scripts/backfill_reports.py
+
+class DailyItemSales(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    item_id: int = Field(foreign_key="item.id", primary_key=True)
+    units: int = 0
+    revenue_cents: int = 0
+    orders: int = 0
+
+class DailyCategorySales(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    category_id: int = Field(primary_key=True)  # 0 = uncategorised items
+    units: int = 0
+    revenue_cents: int = 0
+    orders: int = 0
+
+class DailyPaymentMethodSales(SQLModel, table=True):
+    day: date = Field(primary_key=True)
+    payment_method: str = Field(primary_key=True)
+    payments: int = 0  # successful
+    amount_cents: int = 0
+    declined: int = 0
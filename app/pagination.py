@@ -0,0 +1,27 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor carries the sort-key values of the last row on a page so the next
+page can be fetched with `WHERE (key...) > (:values...)` instead of OFFSET,
+keeping page cost constant however deep the user scrolls.
+"""
+import base64
+import json
+from typing import Any, Optional
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str], arity: int) -> Optional[tuple]:
+    """Return the cursor values, or None if the cursor is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != arity:
+        return None
+    return tuple(values)
@@ -0,0 +1,81 @@
+"""
+Bounded worker pool for bcrypt work.
+
+hash_password/verify_password take 100-300 ms of CPU each. Running them on the
+event loop stalls every other request, so register/login hand them to a
+thread (bcrypt releases the GIL) or process pool. Admission is capped at
+workers + PASSWORD_POOL_MAX_QUEUE jobs; past that, callers get PasswordPoolBusy
+right away and should answer 503 instead of queueing without bound.
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from .security import hash_password, verify_password
+
+PASSWORD_POOL_KIND = os.getenv("PASSWORD_POOL", "thread")  # thread | process
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_POOL_MAX_QUEUE = int(os.getenv("PASSWORD_POOL_MAX_QUEUE", "32"))
+PASSWORD_POOL_RETRY_AFTER = int(os.getenv("PASSWORD_POOL_RETRY_AFTER", "2"))
+
+class PasswordPoolBusy(Exception):
+    """Raised when the pool already holds its maximum number of jobs."""
+
+class PasswordPool:
+    def __init__(
+        self,
+        kind: str = PASSWORD_POOL_KIND,
+        workers: int = PASSWORD_POOL_WORKERS,
+        max_queue: int = PASSWORD_POOL_MAX_QUEUE,
+    ):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor: Optional[Executor] = None
+        # Only touched from the event loop thread, so plain ints are enough
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": max(0, self.in_flight - self.workers),
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_pool = PasswordPool()
+
+async def hash_password_async(password: str) -> str:
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    return await password_pool.run(verify_password, password, hashed)
@@ -0,0 +1,127 @@
+"""
+Payment processing shared by the HTML payment pages and the JSON API.
+
+The gateway is simulated (90% of attempts succeed). A successful charge claims
+the order, converts its stock holds into a sale, records the payment, clears
+the cart and updates the user's order summary and the sales summaries in one
+transaction; a declined one only records the failed attempt (and counts it in
+the payment-method mix).
+"""
+import random
+import string
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .analytics import record_payment_attempt, record_sale
+from .events import stock_changed
+from .inventory import reserve_stock
+from .models import CartItem, Order, OrderItem, Payment
+from .reservations import OrderExpired, consume_holds
+from .summaries import record_order_completed
+
+PAYMENT_METHODS = ["CREDIT_CARD", "DEBIT_CARD", "UPI", "WALLET"]
+
+class AlreadyPaid(Exception):
+    """The order was paid for by a concurrent request."""
+
+class NotAwaitingPayment(Exception):
+    """The order was placed without a payment step (or cancelled), so there is nothing to pay."""
+
+def validate_payment_details(
+    payment_method: str,
+    card_number: str = "",
+    card_name: str = "",
+    card_expiry: str = "",
+    card_cvv: str = "",
+    upi_id: str = "",
+    wallet_provider: str = "",
+) -> Optional[str]:
+    """Return an error message for the customer, or None if the details are acceptable."""
+    if payment_method not in PAYMENT_METHODS:
+        return "Invalid payment method selected"
+    if payment_method in ["CREDIT_CARD", "DEBIT_CARD"]:
+        if not card_number or not card_name or not card_expiry or not card_cvv:
+            return "Please fill all card details"
+        # Basic card validation (demo - in real app, use proper validation)
+        if len(card_number.replace(" ", "")) < 13:
+            return "Invalid card number"
+    elif payment_method == "UPI":
+        if not upi_id or "@" not in upi_id:
+            return "Please enter a valid UPI ID"
+    elif payment_method == "WALLET":
+        if not wallet_provider:
+            return "Please select a wallet provider"
+    return None
+
+async def charge_order(session: AsyncSession, order: Order, user_id: int, payment_method: str) -> Payment:
+    """
+    Run one payment attempt for `order` and commit it; return the Payment row.
+
+    Only PENDING_PAYMENT orders can be charged: an order placed directly was
+    already counted as completed (and took its stock) when it was placed.
+
+    Raises AlreadyPaid if another request claimed the order first,
+    OrderExpired if its stock hold lapsed, NotAwaitingPayment if it is not
+    waiting for a payment, and OutOfStock (after rolling back)
+    if an order placed without holds can no longer be covered; nothing is
+    charged in any of these cases.
+    """
+    if order.status == "EXPIRED":
+        raise OrderExpired()
+    if order.status != "PENDING_PAYMENT":
+        raise NotAwaitingPayment()
+
+    # Simulate payment processing (in real app, integrate with payment gateway)
+    # For demo: 90% success rate
+    payment_success = random.random() > 0.1
+    taken: list[tuple[int, int]] = []
+
+    if payment_success:
+        # Claim the order first so a double-submitted form can't take stock twice,
+        # and so the reservation sweeper can't expire it underneath us
+        claimed = await session.execute(
+            update(Order)
+            .where(Order.id == order.id, Order.payment_status != "PAID", Order.status == "PENDING_PAYMENT")
+            .values(payment_status="PAID", status="PLACED")
+        )
+        if claimed.rowcount == 0:
+            await session.rollback()
+            await session.refresh(order)
+            if order.status == "EXPIRED":
+                raise OrderExpired()
+            if order.payment_status == "PAID":
+                raise AlreadyPaid()
+            raise NotAwaitingPayment()
+
+        # Stock was held when the order was created; orders from before holds
+        # existed take it now, in the same transaction as the payment record
+        if not await consume_holds(session, order.id):
+            taken = list((await session.exec(
+                select(OrderItem.item_id, OrderItem.quantity).where(OrderItem.order_id == order.id)
+            )).all())
+            await reserve_stock(session, taken)
+
+    transaction_id = "TXN" + "".join(random.choices(string.ascii_uppercase + string.digits, k=12))
+    payment = Payment(
+        order_id=order.id,
+        amount_cents=order.total_cents,
+        payment_method=payment_method,
+        payment_status="SUCCESS" if payment_success else "FAILED",
+        transaction_id=transaction_id,
+        completed_at=datetime.utcnow() if payment_success else None,
+    )
+    session.add(payment)
+    await record_payment_attempt(session, payment)
+
+    if payment_success:
+        await session.execute(delete(CartItem).where(CartItem.user_id == user_id))
+        await record_order_completed(session, order)
+        await record_sale(session, order.id, payment.created_at.date())
+    await session.commit()
+    if taken:
+        await stock_changed(session, [item_id for item_id, _ in taken])
+    return payment
@@ -0,0 +1,41 @@
+"""
+Count SQL statements issued through an engine.
+
+Used by scripts/check_query_counts.py to pin a query budget per endpoint so an
+accidental lazy load inside a loop (N+1) fails CI instead of reaching users.
+"""
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Union
+
+from sqlalchemy import Engine, event
+
+class QueryCounter:
+    def __init__(self, engine: Union[Engine, Iterable[Engine]]):
+        # Several engines when reads and writes are routed apart; each is listened to once
+        self.engines = [engine] if isinstance(engine, Engine) else list(dict.fromkeys(engine))
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    def __enter__(self) -> "QueryCounter":
+        for engine in self.engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._on_execute)
+
+@contextmanager
+def assert_max_queries(engine: Union[Engine, Iterable[Engine]], limit: int, label: str = "block") -> Iterator[QueryCounter]:
+    """Fail with the offending SQL if the wrapped block issues more than `limit` statements."""
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = "\n".join(f"  {i + 1}. {sql}" for i, sql in enumerate(counter.statements))
+        raise AssertionError(f"{label}: expected at most {limit} queries, got {counter.count}:\n{listing}")
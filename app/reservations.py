@@ -0,0 +1,224 @@
+"""
+Time-limited stock holds for orders awaiting payment.
+
+Creating an order takes its stock immediately (the same conditional UPDATE as
+checkout) and records one InventoryReservation row per line with an expiry.
+Paying the order consumes the holds; nothing is re-checked, since the stock is
+already set aside. An order left unpaid past RESERVATION_TTL is marked
+EXPIRED by the sweeper, which gives its stock back and deletes its holds. An
+unpaid order is also expired, in the same way, when its user creates a new
+one, so going back and re-submitting checkout never competes with itself.
+
+The sweeper is an asyncio task per worker. It drains expired holds in batches
+through the expires_at index, then sleeps until the next hold is due (capped
+at RESERVATION_SWEEP_INTERVAL). Expiring an order (only while it is
+PENDING_PAYMENT) and claiming it for payment (only while it is not EXPIRED)
+are conditional updates of the same row, so however many workers sweep, each
+order ends up either paid or expired, never both.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import Engine, bindparam, delete, func, insert, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .cache import bump_catalog_version
+from .database import engine as default_engine
+from .events import publish_stock_levels, wants_stock_levels
+from .models import InventoryReservation, Item, Order, UserOrderSummary
+
+RESERVATION_TTL = float(os.getenv("RESERVATION_TTL", "900"))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", "500"))
+# Set to 0 on workers that shouldn't run a sweeper (any number may; one is enough)
+RESERVATION_SWEEPER = os.getenv("RESERVATION_SWEEPER", "1") != "0"
+MIN_SWEEP_DELAY = 0.5
+
+logger = logging.getLogger(__name__)
+
+_hold = InventoryReservation.__table__
+_order = Order.__table__
+_item = Item.__table__
+_summary = UserOrderSummary.__table__
+
+_return_stock = (
+    update(_item)
+    .where(_item.c.id == bindparam("item_id"))
+    .values(stock=_item.c.stock + bindparam("qty"))
+)
+
+class OrderExpired(Exception):
+    """The order's stock hold lapsed before it was paid."""
+
+async def record_holds(session: AsyncSession, order_id: int, lines: Iterable[tuple[int, int]], ttl: float) -> None:
+    """Record holds for stock the caller has just taken; part of the caller's transaction."""
+    expires_at = datetime.utcnow() + timedelta(seconds=ttl)
+    rows = [
+        {"order_id": order_id, "item_id": item_id, "quantity": quantity, "expires_at": expires_at}
+        for item_id, quantity in lines
+    ]
+    if rows:
+        await session.execute(insert(_hold), rows)
+
+async def consume_holds(session: AsyncSession, order_id: int) -> int:
+    """Turn the order's holds into a sale; return how many there were (0 for orders placed without holds)."""
+    result = await session.execute(delete(_hold).where(_hold.c.order_id == order_id))
+    return result.rowcount
+
+async def release_pending_orders(session: AsyncSession, user_id: int) -> list[int]:
+    """
+    Expire the user's unpaid orders that hold stock and give that stock back,
+    inside the caller's transaction; return the item ids released.
+
+    Called before a new order takes stock, so re-submitting checkout replaces
+    the earlier order instead of being blocked by its holds.
+    """
+    pending = select(_hold.c.order_id).join(_order, _order.c.id == _hold.c.order_id).where(_order.c.user_id == user_id)
+    expired_ids = list((await session.execute(
+        update(_order)
+        .where(_order.c.id.in_(pending), _order.c.status == "PENDING_PAYMENT", _order.c.payment_status != "PAID")
+        .values(status="EXPIRED")
+        .returning(_order.c.id)
+    )).scalars())
+    if not expired_ids:
+        return []
+    released = (await session.execute(
+        select(_hold.c.item_id, func.sum(_hold.c.quantity))
+        .where(_hold.c.order_id.in_(expired_ids))
+        .group_by(_hold.c.item_id)
+    )).all()
+    await session.execute(_return_stock, [{"item_id": item_id, "qty": qty} for item_id, qty in released])
+    await session.execute(delete(_hold).where(_hold.c.order_id.in_(expired_ids)))
+    return [item_id for item_id, _ in released]
+
+def sweep_expired(engine: Engine, now: Optional[datetime] = None, batch: int = RESERVATION_SWEEP_BATCH) -> tuple[int, int]:
+    """
+    Expire one batch of orders whose holds have lapsed and give their stock back.
+
+    Returns (orders expired, holds looked at); fewer holds than `batch` means
+    nothing expired is left.
+    """
+    now = now or datetime.utcnow()
+    with engine.connect() as conn:
+        with conn.begin():
+            if conn.dialect.name == "sqlite":
+                # Take the write lock up front so the reads below can't go stale
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            # Walk the expires_at index; an order's lines share one expiry, so dedupe here
+            levels: dict[int, int] = {}
+            due = list(conn.execute(
+                select(_hold.c.order_id).where(_hold.c.expires_at <= now).order_by(_hold.c.expires_at).limit(batch)
+            ).scalars())
+            if not due:
+                return 0, 0
+            order_ids = list(dict.fromkeys(due))
+            expired = conn.execute(
+                update(_order)
+                .where(_order.c.id.in_(order_ids), _order.c.status == "PENDING_PAYMENT", _order.c.payment_status != "PAID")
+                .values(status="EXPIRED")
+                .returning(_order.c.id, _order.c.user_id)
+            ).all()
+            if expired:
+                expired_ids = [row.id for row in expired]
+                released = conn.execute(
+                    select(_hold.c.item_id, func.sum(_hold.c.quantity))
+                    .where(_hold.c.order_id.in_(expired_ids))
+                    .group_by(_hold.c.item_id)
+                ).all()
+                conn.execute(_return_stock, [{"item_id": item_id, "qty": qty} for item_id, qty in released])
+                if wants_stock_levels():
+                    levels = dict(conn.execute(
+                        select(_item.c.id, _item.c.stock).where(_item.c.id.in_([item_id for item_id, _ in released]))
+                    ).all())
+                conn.execute(
+                    update(_summary)
+                    .where(_summary.c.user_id.in_({row.user_id for row in expired}))
+                    .values(revision=_summary.c.revision + 1)
+                )
+            conn.execute(delete(_hold).where(_hold.c.order_id.in_(order_ids)))
+    if expired:
+        bump_catalog_version()
+        publish_stock_levels(levels)
+    return len(expired), len(due)
+
+def seconds_until_next_expiry(engine: Engine) -> Optional[float]:
+    with engine.connect() as conn:
+        next_expiry = conn.execute(select(func.min(_hold.c.expires_at))).scalar()
+    if next_expiry is None:
+        return None
+    if isinstance(next_expiry, str):  # SQLite without type info on aggregates
+        next_expiry = datetime.fromisoformat(next_expiry)
+    return (next_expiry - datetime.utcnow()).total_seconds()
+
+class ReservationSweeper:
+    def __init__(
+        self,
+        engine: Engine,
+        interval: float = RESERVATION_SWEEP_INTERVAL,
+        batch: int = RESERVATION_SWEEP_BATCH,
+        ttl: float = RESERVATION_TTL,
+    ):
+        self.engine = engine
+        # No hold created after this sweep can lapse sooner than one TTL from now
+        self.interval = max(MIN_SWEEP_DELAY, min(interval, ttl))
+        self.batch = batch
+        self.sweeps = 0
+        self.expired_orders = 0
+        self.last_sweep_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def sweep(self) -> int:
+        """Drain every expired hold, batch by batch; return the number of orders expired."""
+        started = time.perf_counter()
+        total = 0
+        while True:
+            expired, looked_at = sweep_expired(self.engine, batch=self.batch)
+            total += expired
+            if looked_at < self.batch:
+                break
+        self.sweeps += 1
+        self.expired_orders += total
+        self.last_sweep_seconds = time.perf_counter() - started
+        return total
+
+    def next_delay(self) -> float:
+        due_in = seconds_until_next_expiry(self.engine)
+        if due_in is None:
+            return self.interval
+        return min(self.interval, max(MIN_SWEEP_DELAY, due_in))
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep)
+                delay = await asyncio.to_thread(self.next_delay)
+            except Exception:
+                logger.exception("Reservation sweep failed")
+                delay = self.interval
+            await asyncio.sleep(delay)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "expired_orders": self.expired_orders,
+            "last_sweep_seconds": round(self.last_sweep_seconds, 6),
+        }
+
+reservation_sweeper = ReservationSweeper(default_engine)
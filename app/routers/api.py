@@ -0,0 +1,302 @@
+"""
+Versioned JSON API (/api/v1) for non-browser clients.
+
+Same data and rules as the HTML pages, but answers are JSON encoded with
+orjson and there are no redirects: every mutation returns the resulting state.
+POST /cart/batch applies any number of add/set/remove operations in one
+transaction, so filling a cart is one round trip instead of one per item.
+Authenticate with `Authorization: Bearer <token>` from POST /auth/token.
+"""
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..admission import admit_write
+from ..etag import PRIVATE_REVALIDATE, PUBLIC_REVALIDATE, etag_headers, make_etag, not_modified
+from ..inventory import OutOfStock, place_order_from_cart
+from ..models import CartItem, Item, Order, OrderItem, Payment, User
+from ..password_pool import PASSWORD_POOL_RETRY_AFTER, PasswordPoolBusy, verify_password_async
+from ..payments import AlreadyPaid, NotAwaitingPayment, charge_order, validate_payment_details
+from ..reservations import RESERVATION_TTL, OrderExpired
+from ..security import Principal, create_access_token, get_current_user, get_read_session, get_session
+from .items import MAX_PAGE_SIZE, PAGE_SIZE, load_categories, load_items_page
+from .orders import (
+    MAX_ORDERS_PAGE_SIZE,
+    ORDER_STATUSES,
+    ORDERS_PAGE_SIZE,
+    load_order_summary,
+    load_orders_page,
+    parse_day,
+)
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+MAX_CART_OPERATIONS = 100
+
+class Credentials(BaseModel):
+    email: str
+    password: str
+
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    item_id: int
+    # add: increase by this much; set: new quantity (0 removes); remove: ignored
+    quantity: int = 1
+
+class CartBatch(BaseModel):
+    operations: list[CartOperation] = Field(min_length=1, max_length=MAX_CART_OPERATIONS)
+
+class PaymentDetails(BaseModel):
+    payment_method: str
+    card_number: str = ""
+    card_name: str = ""
+    card_expiry: str = ""
+    card_cvv: str = ""
+    upi_id: str = ""
+    wallet_provider: str = ""
+
+def _item_json(item: Item) -> dict:
+    return {
+        "id": item.id,
+        "name": item.name,
+        "sku": item.sku,
+        "description": item.description,
+        "price_cents": item.price_cents,
+        "stock": item.stock,
+        "category_id": item.category_id,
+    }
+
+def _cart_json(lines: list[CartItem]) -> dict:
+    return {
+        "lines": [
+            {
+                "id": line.id,
+                "item_id": line.item_id,
+                "name": line.item.name if line.item else None,
+                "price_cents": line.item.price_cents if line.item else 0,
+                "quantity": line.quantity,
+            }
+            for line in lines
+        ],
+        "total_cents": sum(line.quantity * (line.item.price_cents if line.item else 0) for line in lines),
+    }
+
+def _order_json(order: Order) -> dict:
+    return {
+        "id": order.id,
+        "created_at": order.created_at,
+        "status": order.status,
+        "payment_status": order.payment_status,
+        "total_cents": order.total_cents,
+        "tracking_id": order.tracking_id,
+    }
+
+def _payment_json(payment: Optional[Payment]) -> Optional[dict]:
+    if payment is None:
+        return None
+    return {
+        "id": payment.id,
+        "payment_method": payment.payment_method,
+        "payment_status": payment.payment_status,
+        "amount_cents": payment.amount_cents,
+        "transaction_id": payment.transaction_id,
+        "created_at": payment.created_at,
+        "completed_at": payment.completed_at,
+    }
+
+async def _cart_lines(session: AsyncSession, user_id: int) -> list[CartItem]:
+    return list((await session.exec(
+        select(CartItem).where(CartItem.user_id == user_id).options(joinedload(CartItem.item)).order_by(CartItem.id)
+    )).all())
+
+async def _own_order(session: AsyncSession, order_id: int, user_id: int) -> Order:
+    order = (await session.exec(select(Order).where(Order.id == order_id, Order.user_id == user_id))).first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
+
+@router.post("/auth/token")
+async def issue_token(credentials: Credentials, session: AsyncSession = Depends(get_session)):
+    user = (await session.exec(select(User).where(User.email == credentials.email))).first()
+    try:
+        password_ok = bool(user) and await verify_password_async(credentials.password, user.hashed_password)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=503, detail="Too many logins, try again shortly",
+            headers={"Retry-After": str(PASSWORD_POOL_RETRY_AFTER)},
+        )
+    if not password_ok:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    return ORJSONResponse({"access_token": create_access_token(user.email), "token_type": "bearer"})
+
+@router.get("/categories")
+async def list_categories(session: AsyncSession = Depends(get_read_session)):
+    return ORJSONResponse([{"id": c.id, "name": c.name} for c in await load_categories(session)])
+
+@router.get("/items")
+async def list_items(
+    request: Request,
+    category: str | None = Query(default=None),
+    q: str | None = Query(default=None, max_length=100),
+    after: str | None = Query(default=None),
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session),
+):
+    q = (q or "").strip() or None
+    items, next_cursor, digest = await load_items_page(session, category, q, after, limit)
+    etag = make_etag("api-items", category, q, after, limit, digest)
+    cached = not_modified(request, etag, PUBLIC_REVALIDATE)
+    if cached is not None:
+        return cached
+    return ORJSONResponse(
+        {"items": [_item_json(item) for item in items], "next_cursor": next_cursor},
+        headers=etag_headers(etag, PUBLIC_REVALIDATE),
+    )
+
+@router.get("/items/{item_id}")
+async def get_item(item_id: int, session: AsyncSession = Depends(get_read_session)):
+    item = await session.get(Item, item_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return ORJSONResponse(_item_json(item))
+
+@router.get("/cart")
+async def get_cart(session: AsyncSession = Depends(get_read_session), user: Principal = Depends(get_current_user)):
+    return ORJSONResponse(_cart_json(await _cart_lines(session, user.id)))
+
+@router.post("/cart/batch")
+async def update_cart(batch: CartBatch, session: AsyncSession = Depends(get_session), user: Principal = Depends(get_current_user)):
+    """Apply the operations in order, write only the net changes and return the new cart."""
+    lines = {line.item_id: line for line in await _cart_lines(session, user.id)}
+    wanted = {item_id: line.quantity for item_id, line in lines.items()}
+    for operation in batch.operations:
+        if operation.op == "add":
+            wanted[operation.item_id] = wanted.get(operation.item_id, 0) + max(1, operation.quantity)
+        elif operation.op == "set":
+            wanted[operation.item_id] = max(0, operation.quantity)
+        else:
+            wanted[operation.item_id] = 0
+
+    new_ids = [item_id for item_id, quantity in wanted.items() if quantity > 0 and item_id not in lines]
+    items = {item.id: item for item in (await session.exec(select(Item).where(Item.id.in_(new_ids)))).all()} if new_ids else {}
+    missing = sorted(set(new_ids) - set(items))
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Item not found: {', '.join(map(str, missing))}")
+
+    for item_id, quantity in wanted.items():
+        line = lines.get(item_id)
+        if line is None:
+            if quantity > 0:
+                lines[item_id] = CartItem(user_id=user.id, item_id=item_id, quantity=quantity, item=items[item_id])
+                session.add(lines[item_id])
+        elif quantity == 0:
+            await session.delete(lines.pop(item_id))
+        elif line.quantity != quantity:
+            line.quantity = quantity
+    await session.commit()
+    return ORJSONResponse(_cart_json(sorted(lines.values(), key=lambda line: line.id)))
+
+@router.get("/orders")
+async def list_orders(
+    request: Request,
+    status: str | None = Query(default=None),
+    date_from: str | None = Query(default=None, alias="from"),
+    date_to: str | None = Query(default=None, alias="to"),
+    after: str | None = Query(default=None),
+    limit: int = Query(default=ORDERS_PAGE_SIZE, ge=1, le=MAX_ORDERS_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session),
+    user: Principal = Depends(get_current_user),
+):
+    status = status if status in ORDER_STATUSES else None
+    day_from, day_to = parse_day(date_from), parse_day(date_to)
+    summary = await load_order_summary(session, user.id)
+    etag = make_etag("api-orders", user.id, summary.revision, status, day_from, day_to, after, limit)
+    cached = not_modified(request, etag, PRIVATE_REVALIDATE)
+    if cached is not None:
+        return cached
+    orders, next_cursor = await load_orders_page(session, user.id, status, day_from, day_to, after, limit)
+    return ORJSONResponse(
+        {
+            "summary": {
+                "order_count": summary.order_count,
+                "lifetime_spend_cents": summary.lifetime_spend_cents,
+                "last_order_id": summary.last_order_id,
+                "last_order_at": summary.last_order_at,
+            },
+            "orders": [_order_json(order) for order in orders],
+            "next_cursor": next_cursor,
+        },
+        headers=etag_headers(etag, PRIVATE_REVALIDATE),
+    )
+
+@router.post("/orders", status_code=201, dependencies=[Depends(admit_write)])
+async def create_order(session: AsyncSession = Depends(get_session), user: Principal = Depends(get_current_user)):
+    """Turn the cart into an order awaiting payment, holding its stock for RESERVATION_TTL seconds."""
+    try:
+        order = await place_order_from_cart(
+            session, user.id, status="PENDING_PAYMENT", payment_status="PENDING",
+            clear_cart=False, hold_ttl=RESERVATION_TTL,
+        )
+    except OutOfStock as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if order is None:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+    return ORJSONResponse(_order_json(order), status_code=201)
+
+@router.get("/orders/{order_id}")
+async def get_order(order_id: int, session: AsyncSession = Depends(get_read_session), user: Principal = Depends(get_current_user)):
+    order = await _own_order(session, order_id, user.id)
+    lines = (await session.exec(
+        select(OrderItem).where(OrderItem.order_id == order.id).options(joinedload(OrderItem.item))
+    )).all()
+    payment = (await session.exec(
+        select(Payment).where(Payment.order_id == order.id).order_by(Payment.created_at.desc()).limit(1)
+    )).first()
+    return ORJSONResponse({
+        **_order_json(order),
+        "lines": [
+            {
+                "item_id": line.item_id,
+                "name": line.item.name if line.item else None,
+                "quantity": line.quantity,
+                "price_cents_each": line.price_cents_each,
+            }
+            for line in lines
+        ],
+        "payment": _payment_json(payment),
+    })
+
+@router.post("/orders/{order_id}/payments", status_code=201, dependencies=[Depends(admit_write)])
+async def pay_order(
+    order_id: int,
+    details: PaymentDetails,
+    session: AsyncSession = Depends(get_session),
+    user: Principal = Depends(get_current_user),
+):
+    """201 with the payment when it succeeds, 402 when the (simulated) gateway declines it."""
+    order = await _own_order(session, order_id, user.id)
+    if order.payment_status == "PAID":
+        raise HTTPException(status_code=409, detail="Order is already paid")
+    error = validate_payment_details(**details.model_dump())
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    try:
+        payment = await charge_order(session, order, user.id, details.payment_method)
+    except AlreadyPaid:
+        raise HTTPException(status_code=409, detail="Order is already paid")
+    except NotAwaitingPayment:
+        raise HTTPException(status_code=409, detail="Order is not awaiting payment")
+    except OrderExpired:
+        raise HTTPException(status_code=409, detail="Order expired before it was paid; its items were released")
+    except OutOfStock as e:
+        raise HTTPException(status_code=409, detail=f"{e}. You have not been charged.")
+    await session.refresh(order)
+    return ORJSONResponse(
+        {"order": _order_json(order), "payment": _payment_json(payment)},
+        status_code=201 if payment.payment_status == "SUCCESS" else 402,
+    )
@@ -1,13 +1,20 @@
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..models import User
-from ..security import get_session, hash_password, verify_password, create_access_token, validate_password
+from ..password_pool import PASSWORD_POOL_RETRY_AFTER, PasswordPoolBusy, hash_password_async, verify_password_async
+from ..security import (
+    get_session,
+    create_access_token,
+    validate_password,
+    principal_cache,
+    token_from_request,
+)
+from ..templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 @router.get("/register")
 async def register_form(request: Request):
@@ -18,7 +25,7 @@ async def register(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
     # Validate email format (basic check)
     if "@" not in email or "." not in email.split("@")[-1]:
@@ -41,7 +48,7 @@ async def register(
     
     try:
         # Check if email already exists
-        existing = session.exec(select(User).where(User.email == email)).first()
+        existing = (await session.exec(select(User).where(User.email == email))).first()
         if existing:
             return templates.TemplateResponse(
                 "register.html",
@@ -50,12 +57,18 @@ async def register(
             )
         
         # Create user - use cleaned password (already validated)
-        user = User(email=email, hashed_password=hash_password(password_clean))
+        user = User(email=email, hashed_password=await hash_password_async(password_clean))
         session.add(user)
-        session.commit()
-        session.refresh(user)
+        await session.commit()
         response = RedirectResponse(url="/auth/login", status_code=303)
         return response
+    except PasswordPoolBusy:
+        return templates.TemplateResponse(
+            "register.html",
+            {"request": request, "error": "We're handling a lot of sign-ups right now. Please try again in a moment."},
+            status_code=503,
+            headers={"Retry-After": str(PASSWORD_POOL_RETRY_AFTER)},
+        )
     except ValueError as e:
         # Handle password-related errors
         error_message = str(e)
@@ -102,10 +115,19 @@ async def login(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
-    user = session.exec(select(User).where(User.email == email)).first()
-    if not user or not verify_password(password, user.hashed_password):
+    user = (await session.exec(select(User).where(User.email == email))).first()
+    try:
+        password_ok = bool(user) and await verify_password_async(password, user.hashed_password)
+    except PasswordPoolBusy:
+        return templates.TemplateResponse(
+            "login.html",
+            {"request": request, "error": "We're handling a lot of logins right now. Please try again in a moment."},
+            status_code=503,
+            headers={"Retry-After": str(PASSWORD_POOL_RETRY_AFTER)},
+        )
+    if not password_ok:
         return templates.TemplateResponse(
             "login.html",
             {"request": request, "error": "Invalid email or password. Please try again."},
@@ -118,7 +140,10 @@ async def login(
     return response
 
 @router.post("/logout")
-async def logout():
+async def logout(request: Request):
+    token = token_from_request(request)
+    if token:
+        principal_cache.discard(token)
     response = RedirectResponse(url="/", status_code=303)
     response.delete_cookie("access_token")
     return response
@@ -0,0 +1,75 @@
+"""
+Bulk inventory endpoints (/inventory) for supplier feeds; require ADMIN_TOKEN.
+
+POST /inventory/import takes the feed as the raw request body (CSV or JSON
+Lines). The body is spooled (to disk past IMPORT_SPOOL_MEMORY) while it
+arrives and then applied in batches by app.inventory_io, so neither step holds
+the whole feed in memory. GET /inventory/export streams the catalog back in
+the same format.
+"""
+import io
+import os
+import tempfile
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..inventory_io import FORMATS, export_inventory, import_inventory, read_records
+from ..security import get_session, open_read_session, require_admin
+
+router = APIRouter(default_response_class=ORJSONResponse, dependencies=[Depends(require_admin)])
+
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(100 * 1024 * 1024)))
+IMPORT_SPOOL_MEMORY = 1024 * 1024
+
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "jsonl": "application/x-ndjson"}
+
+def feed_format(request: Request, fmt: str | None) -> str:
+    """`format` query parameter, else guessed from Content-Type (CSV unless it says JSON)."""
+    if fmt is None:
+        content_type = request.headers.get("content-type", "")
+        fmt = "jsonl" if "json" in content_type else "csv"
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+    return fmt
+
+@router.post("/import")
+async def import_feed(
+    request: Request,
+    fmt: str | None = Query(default=None, alias="format"),
+    session: AsyncSession = Depends(get_session),
+):
+    """Apply a CSV / JSON Lines feed; 200 with counts and per-line errors, even when some lines failed."""
+    fmt = feed_format(request, fmt)
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_MEMORY) as spool:
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Feeds are limited to {IMPORT_MAX_BYTES} bytes")
+            spool.write(chunk)
+        spool.seek(0)
+        text = io.TextIOWrapper(spool, encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            report = await import_inventory(session, read_records(text, fmt))
+        finally:
+            text.detach()
+    return ORJSONResponse(report.as_dict())
+
+@router.get("/export")
+async def export_feed(fmt: str = Query(default="csv", alias="format")):
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(FORMATS)}")
+
+    async def body():
+        # Its own session: the request's dependencies are closed once streaming starts
+        async with open_read_session() as session:
+            async for chunk in export_inventory(session, fmt):
+                yield chunk.encode()
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="inventory.{fmt}"', "Cache-Control": "no-store"},
+    )
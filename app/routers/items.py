@@ -1,29 +1,161 @@
-from fastapi import APIRouter, Depends, Request, Query
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
+import hashlib
+from typing import NamedTuple
 
-from ..security import get_session
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import or_, text, tuple_
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..cache import catalog_cache, catalog_version
+from ..database import DIALECT
+from ..events import SSE_KEEPALIVE, TooManySubscribers, stock_hub
+from ..etag import PUBLIC_REVALIDATE, etag_headers, make_etag, not_modified
+from ..pagination import decode_cursor, encode_cursor
+from ..search import fts_match_expression, search_terms
+from ..security import get_read_session
+from ..templating import templates
 from ..models import Category, Item
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
-@router.get("")
-async def list_items(request: Request, category: str | None = Query(default=None), session: Session = Depends(get_session)):
-    categories = session.exec(select(Category).order_by(Category.name)).all()
-    items_query = select(Item).order_by(Item.name)
-    selected_category = None
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+class ItemsPage(NamedTuple):
+    items: list[Item]
+    next_cursor: str | None
+    # Digest of the rendered fields; equal digests render identical grids
+    digest: str
+
+async def load_categories(session: AsyncSession) -> list[Category]:
+    version = catalog_version()
+    categories = catalog_cache.get(("categories",))
+    if categories is None:
+        categories = list((await session.exec(select(Category).order_by(Category.name))).all())
+        for cat in categories:
+            session.expunge(cat)
+        catalog_cache.set(("categories",), categories, version)
+    return categories
+
+async def load_items_page(
+    session: AsyncSession,
+    category: str | None,
+    q: str | None,
+    after: str | None,
+    limit: int,
+) -> ItemsPage:
+    """Return one page of items ordered by (name, id) and the cursor for the next page."""
+    version = catalog_version()
+    key = ("items", category, q, after, limit)
+    cached = catalog_cache.get(key)
+    if cached is not None:
+        return cached
+
+    items_query = select(Item).order_by(Item.name, Item.id).limit(limit + 1)
     if category:
-        selected_category = session.exec(select(Category).where(Category.name == category)).first()
+        selected_category = next((c for c in await load_categories(session) if c.name == category), None)
         if selected_category:
             items_query = items_query.where(Item.category_id == selected_category.id)
-    items = session.exec(items_query).all()
-    return templates.TemplateResponse(
+    if q:
+        if DIALECT == "sqlite":
+            match = fts_match_expression(q)
+            if match:
+                matching_ids = text("SELECT rowid FROM item_fts WHERE item_fts MATCH :match").bindparams(match=match)
+                items_query = items_query.where(Item.id.in_(matching_ids))
+        else:
+            for term in search_terms(q):
+                pattern = f"%{term}%"
+                items_query = items_query.where(or_(Item.name.ilike(pattern), Item.description.ilike(pattern)))
+    position = decode_cursor(after, 2)
+    # A cursor is only ever (name, id); anything else is tampered with and means the first page
+    if position and isinstance(position[0], str) and type(position[1]) is int:
+        items_query = items_query.where(tuple_(Item.name, Item.id) > tuple_(position[0], position[1]))
+
+    items = list((await session.exec(items_query)).all())
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].name, items[-1].id)
+    digest = hashlib.sha1()
+    for item in items:
+        session.expunge(item)
+        digest.update(repr((item.id, item.name, item.description, item.price_cents, item.stock)).encode())
+    page = ItemsPage(items, next_cursor, digest.hexdigest())
+    catalog_cache.set(key, page, version)
+    return page
+
+@router.get("")
+async def list_items(
+    request: Request,
+    category: str | None = Query(default=None),
+    q: str | None = Query(default=None, max_length=100),
+    after: str | None = Query(default=None),
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session),
+):
+    q = (q or "").strip() or None
+    categories = await load_categories(session)
+    categories_key = [(c.id, c.name) for c in categories]
+    items, next_cursor, digest = await load_items_page(session, category, q, after, limit)
+    etag = make_etag("items", category, q, after, limit, digest, categories_key)
+    cached = not_modified(request, etag, PUBLIC_REVALIDATE)
+    if cached is not None:
+        return cached
+    return templates.StreamingTemplateResponse(
         "items.html",
         {
             "request": request,
             "categories": categories,
             "items": items,
             "selected": category or "All",
+            "q": q or "",
+            "next_cursor": next_cursor,
+            "is_first_page": not after,
+            # Fragments are keyed on what they render, so they can't outlive the rows behind them
+            "categories_key": repr(categories_key),
+            "items_digest": digest,
+            "page_key": (category, q, after, limit),
         },
+        headers=etag_headers(etag, PUBLIC_REVALIDATE),
     )
+
+def parse_item_ids(value: str) -> list[int]:
+    """Item ids from a comma-separated query parameter; junk is skipped, at most one page's worth is kept."""
+    ids = [int(part) for part in value.split(",") if part.strip().isdigit()]
+    return list(dict.fromkeys(ids))[:MAX_PAGE_SIZE]
+
+def _sse(event: str, levels: dict[int, int]) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(levels, option=orjson.OPT_NON_STR_KEYS) + b"\n\n"
+
+@router.get("/stream")
+async def stock_stream(ids: str = Query(default="", max_length=2000), session: AsyncSession = Depends(get_read_session)):
+    """
+    Server-Sent Events with the stock levels of the listed items: a snapshot
+    first (so a reconnecting page catches up), then `stock` events as they
+    change, e.g. `{"12": 0, "15": 7}`.
+    """
+    item_ids = parse_item_ids(ids)
+    if not item_ids:
+        raise HTTPException(status_code=400, detail="ids must list the item ids shown on the page")
+    # Read before streaming: the session is closed once the response starts
+    snapshot = dict((await session.execute(select(Item.id, Item.stock).where(Item.id.in_(item_ids)))).all())
+    try:
+        stock_hub.admit()
+    except TooManySubscribers:
+        raise HTTPException(status_code=503, detail="Live updates are busy; reload for current stock", headers={"Retry-After": "30"})
+
+    async def events():
+        # Subscribed in here so the finally below always runs for it
+        subscription = stock_hub.subscribe(item_ids)
+        try:
+            yield b"retry: 5000\n\n" + _sse("stock", snapshot)
+            while True:
+                levels = await subscription.next(SSE_KEEPALIVE)
+                # A comment line keeps proxies from closing an idle stream
+                yield _sse("stock", levels) if levels else b": keepalive\n\n"
+        finally:
+            stock_hub.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"})
@@ -1,66 +1,154 @@
-from uuid import uuid4
-from fastapi import APIRouter, Depends, HTTPException, Request
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..security import get_session, get_current_user
-from ..models import CartItem, Item, Order, OrderItem, Payment, User
+from ..admission import admit_write
+from ..etag import PRIVATE_REVALIDATE, etag_headers, make_etag, not_modified
+from ..inventory import OutOfStock, place_order_from_cart
+from ..pagination import decode_cursor, encode_cursor
+from ..security import Principal, get_read_session, get_session, get_current_user
+from ..templating import templates
+from ..models import Order, OrderItem, Payment, UserOrderSummary
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+
+ORDERS_PAGE_SIZE = 20
+MAX_ORDERS_PAGE_SIZE = 100
+ORDER_STATUSES = ["PENDING_PAYMENT", "PLACED", "SHIPPED", "DELIVERED", "CANCELLED", "EXPIRED"]
+
+class OrdersPage(NamedTuple):
+    orders: list[Order]
+    next_cursor: str | None
+
+def parse_day(value: str | None) -> date | None:
+    """Date filter from a form field; empty or malformed input means no filter."""
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+async def load_order_summary(session: AsyncSession, user_id: int) -> UserOrderSummary:
+    summary = await session.get(UserOrderSummary, user_id)
+    return summary or UserOrderSummary(user_id=user_id)
+
+async def load_orders_page(
+    session: AsyncSession,
+    user_id: int,
+    status: str | None,
+    date_from: date | None,
+    date_to: date | None,
+    after: str | None,
+    limit: int,
+) -> OrdersPage:
+    """One page of the user's orders, newest first, keyed on (created_at, id)."""
+    query = (
+        select(Order)
+        .where(Order.user_id == user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if status:
+        query = query.where(Order.status == status)
+    if date_from:
+        query = query.where(Order.created_at >= datetime.combine(date_from, time.min))
+    if date_to:
+        query = query.where(Order.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    position = decode_cursor(after, 2)
+    if position:
+        try:
+            created_at, order_id = datetime.fromisoformat(position[0]), int(position[1])
+        except (TypeError, ValueError):
+            pass
+        else:
+            query = query.where(tuple_(Order.created_at, Order.id) < tuple_(created_at, order_id))
+
+    orders = list((await session.exec(query)).all())
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1].created_at, orders[-1].id)
+    return OrdersPage(orders, next_cursor)
 
 @router.get("")
-async def list_orders(request: Request, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
-    orders = session.exec(select(Order).where(Order.user_id == user.id).order_by(Order.created_at.desc())).all()
-    return templates.TemplateResponse("orders.html", {"request": request, "orders": orders})
-
-@router.post("/checkout")
-async def checkout(session: Session = Depends(get_session), user: User = Depends(get_current_user)):
-    cart_items = session.exec(select(CartItem).where(CartItem.user_id == user.id)).all()
-    if not cart_items:
-        raise HTTPException(status_code=400, detail="Cart is empty")
+async def list_orders(
+    request: Request,
+    status: str | None = Query(default=None),
+    date_from: str | None = Query(default=None, alias="from"),
+    date_to: str | None = Query(default=None, alias="to"),
+    after: str | None = Query(default=None),
+    limit: int = Query(default=ORDERS_PAGE_SIZE, ge=1, le=MAX_ORDERS_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session),
+    user: Principal = Depends(get_current_user),
+):
+    status = status if status in ORDER_STATUSES else None
+    day_from, day_to = parse_day(date_from), parse_day(date_to)
+    summary = await load_order_summary(session, user.id)
+    etag = make_etag("orders", user.id, summary.revision, status, day_from, day_to, after, limit)
+    cached = not_modified(request, etag, PRIVATE_REVALIDATE)
+    if cached is not None:
+        return cached
+    orders, next_cursor = await load_orders_page(session, user.id, status, day_from, day_to, after, limit)
+    return templates.StreamingTemplateResponse(
+        "orders.html",
+        {
+            "request": request,
+            "orders": orders,
+            "summary": summary,
+            "statuses": ORDER_STATUSES,
+            "status": status or "",
+            "date_from": day_from.isoformat() if day_from else "",
+            "date_to": day_to.isoformat() if day_to else "",
+            "next_cursor": next_cursor,
+            "is_first_page": not after,
+        },
+        headers=etag_headers(etag, PRIVATE_REVALIDATE),
+    )
 
-    # Validate stock
-    unavailable: list[str] = []
-    for ci in cart_items:
-        item = session.get(Item, ci.item_id)
-        if not item or item.stock < ci.quantity:
-            unavailable.append(item.name if item else f"Item {ci.item_id}")
-    if unavailable:
-        # Persist error via querystring or flash; here simple redirect with message not implemented
-        raise HTTPException(status_code=409, detail=f"Not Available: {', '.join(unavailable)}")
-
-    # Create order and decrement stock
-    order = Order(user_id=user.id, status="PLACED", tracking_id=str(uuid4()))
-    session.add(order)
-    session.commit()
-    session.refresh(order)
-
-    total_cents = 0
-    for ci in cart_items:
-        item = session.get(Item, ci.item_id)
-        if item is None:
-            continue
-        item.stock -= ci.quantity
-        line_total = item.price_cents * ci.quantity
-        total_cents += line_total
-        session.add(OrderItem(order_id=order.id, item_id=item.id, quantity=ci.quantity, price_cents_each=item.price_cents))
-        session.delete(ci)
-
-    order.total_cents = total_cents
-    session.add(order)
-    session.commit()
+@router.post("/checkout", dependencies=[Depends(admit_write)])
+async def checkout(session: AsyncSession = Depends(get_session), user: Principal = Depends(get_current_user)):
+    try:
+        order = await place_order_from_cart(session, user.id, status="PLACED")
+    except OutOfStock as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if order is None:
+        raise HTTPException(status_code=400, detail="Cart is empty")
 
     return RedirectResponse(url=f"/orders/{order.id}", status_code=303)
 
 @router.get("/{order_id}")
-async def order_detail(order_id: int, request: Request, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
-    order = session.get(Order, order_id)
-    if not order or order.user_id != user.id:
+async def order_detail(order_id: int, request: Request, session: AsyncSession = Depends(get_read_session), user: Principal = Depends(get_current_user)):
+    order = (await session.exec(select(Order).where(Order.id == order_id, Order.user_id == user.id))).first()
+    if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Get payment information
-    payment = session.exec(select(Payment).where(Payment.order_id == order.id).order_by(Payment.created_at.desc())).first()
-    
-    return templates.TemplateResponse("order_detail.html", {"request": request, "order": order, "payment": payment})
+    payment = (await session.exec(select(Payment).where(Payment.order_id == order.id).order_by(Payment.created_at.desc()))).first()
+
+    order_items = (await session.exec(
+        select(OrderItem).where(OrderItem.order_id == order.id).options(joinedload(OrderItem.item))
+    )).all()
+
+    # The lines show the item's current name and description, so a catalog edit must change the tag
+    etag = make_etag(
+        "order", order.id, order.status, order.payment_status, order.total_cents,
+        payment and (payment.id, payment.payment_status),
+        [
+            (oi.item_id, oi.quantity, oi.price_cents_each, oi.item and (oi.item.name, oi.item.description))
+            for oi in order_items
+        ],
+    )
+    cached = not_modified(request, etag, PRIVATE_REVALIDATE)
+    if cached is not None:
+        return cached
+
+    return templates.StreamingTemplateResponse(
+        "order_detail.html",
+        {"request": request, "order": order, "order_items": order_items, "payment": payment},
+        headers=etag_headers(etag, PRIVATE_REVALIDATE),
+    )
@@ -1,22 +1,27 @@
-import random
-import string
-from datetime import datetime
-from uuid import uuid4
 from fastapi import APIRouter, Depends, Form, HTTPException, Request
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlmodel import Session, select
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..security import get_session, get_current_user
-from ..models import CartItem, Item, Order, OrderItem, Payment, User
+from ..admission import admit_write
+from ..inventory import OutOfStock, place_order_from_cart
+from ..payments import AlreadyPaid, NotAwaitingPayment, charge_order, validate_payment_details
+from ..reservations import RESERVATION_TTL, OrderExpired
+from ..security import Principal, get_session, get_current_user
+from ..templating import templates
+from ..models import CartItem, Order, Payment
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
+
+EXPIRED_MESSAGE = "This order expired before it was paid and its items were released. Please check out again."
 
 @router.get("/checkout")
-async def checkout_page(request: Request, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+async def checkout_page(request: Request, session: AsyncSession = Depends(get_session), user: Principal = Depends(get_current_user)):
     """Show checkout page with order summary before payment"""
-    cart_items = session.exec(select(CartItem).where(CartItem.user_id == user.id)).all()
+    cart_items = (await session.exec(
+        select(CartItem).where(CartItem.user_id == user.id).options(joinedload(CartItem.item))
+    )).all()
     if not cart_items:
         return RedirectResponse(url="/cart", status_code=303)
     
@@ -26,9 +31,8 @@ async def checkout_page(request: Request, session: Session = Depends(get_session
     # Validate stock
     unavailable: list[str] = []
     for ci in cart_items:
-        item = session.get(Item, ci.item_id)
-        if not item or item.stock < ci.quantity:
-            unavailable.append(item.name if item else f"Item {ci.item_id}")
+        if not ci.item or ci.item.stock < ci.quantity:
+            unavailable.append(ci.item.name if ci.item else f"Item {ci.item_id}")
     
     return templates.TemplateResponse(
         "checkout.html",
@@ -40,63 +44,36 @@ async def checkout_page(request: Request, session: Session = Depends(get_session
         },
     )
 
-@router.post("/create-order")
-async def create_order(session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+@router.post("/create-order", dependencies=[Depends(admit_write)])
+async def create_order(session: AsyncSession = Depends(get_session), user: Principal = Depends(get_current_user)):
     """Create order and redirect to payment"""
     try:
-        cart_items = session.exec(select(CartItem).where(CartItem.user_id == user.id)).all()
-        if not cart_items:
-            raise HTTPException(status_code=400, detail="Cart is empty")
-
-        # Validate stock
-        unavailable: list[str] = []
-        for ci in cart_items:
-            item = session.get(Item, ci.item_id)
-            if not item or item.stock < ci.quantity:
-                unavailable.append(item.name if item else f"Item {ci.item_id}")
-        if unavailable:
-            raise HTTPException(status_code=409, detail=f"Not Available: {', '.join(unavailable)}")
-
-        # Create order (without payment yet)
-        order = Order(
-            user_id=user.id,
-            status="PENDING_PAYMENT",
-            tracking_id=str(uuid4()),
-            payment_status="PENDING",
+        # Stock is held for RESERVATION_TTL; the cart is kept until the payment succeeds
+        order = await place_order_from_cart(
+            session, user.id, status="PENDING_PAYMENT", payment_status="PENDING",
+            clear_cart=False, hold_ttl=RESERVATION_TTL,
         )
-        session.add(order)
-        session.commit()
-        session.refresh(order)
-
-        total_cents = 0
-        for ci in cart_items:
-            item = session.get(Item, ci.item_id)
-            if item is None:
-                continue
-            line_total = item.price_cents * ci.quantity
-            total_cents += line_total
-            session.add(OrderItem(order_id=order.id, item_id=item.id, quantity=ci.quantity, price_cents_each=item.price_cents))
-
-        order.total_cents = total_cents
-        session.add(order)
-        session.commit()
-
-        return RedirectResponse(url=f"/payment/{order.id}", status_code=303)
+    except OutOfStock as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         import traceback
         error_msg = str(e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error creating order: {error_msg}")
+    if order is None:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    return RedirectResponse(url=f"/payment/{order.id}", status_code=303)
 
 @router.get("/{order_id}")
-async def payment_page(order_id: int, request: Request, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+async def payment_page(order_id: int, request: Request, session: AsyncSession = Depends(get_session), user: Principal = Depends(get_current_user)):
     """Show payment page for an order"""
-    order = session.get(Order, order_id)
+    order = await session.get(Order, order_id)
     if not order or order.user_id != user.id:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    if order.payment_status == "PAID":
+    if order.payment_status == "PAID" or order.status not in ("PENDING_PAYMENT", "EXPIRED"):
         return RedirectResponse(url=f"/orders/{order.id}", status_code=303)
     
     return templates.TemplateResponse(
@@ -104,10 +81,11 @@ async def payment_page(order_id: int, request: Request, session: Session = Depen
         {
             "request": request,
             "order": order,
+            "error": EXPIRED_MESSAGE if order.status == "EXPIRED" else None,
         },
     )
 
-@router.post("/{order_id}/process")
+@router.post("/{order_id}/process", dependencies=[Depends(admit_write)])
 async def process_payment(
     order_id: int,
     request: Request,
@@ -118,130 +96,77 @@ async def process_payment(
     card_cvv: str = Form(""),
     upi_id: str = Form(""),
     wallet_provider: str = Form(""),
-    session: Session = Depends(get_session),
-    user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+    user: Principal = Depends(get_current_user),
 ):
     """Process payment for an order"""
-    order = session.get(Order, order_id)
+    order = await session.get(Order, order_id)
     if not order or order.user_id != user.id:
         raise HTTPException(status_code=404, detail="Order not found")
     
     if order.payment_status == "PAID":
         return RedirectResponse(url=f"/orders/{order.id}", status_code=303)
     
-    # Validate payment method
-    valid_methods = ["CREDIT_CARD", "DEBIT_CARD", "UPI", "WALLET"]
-    if payment_method not in valid_methods:
+    error = validate_payment_details(
+        payment_method, card_number, card_name, card_expiry, card_cvv, upi_id, wallet_provider
+    )
+    if error:
         return templates.TemplateResponse(
             "payment.html",
             {
                 "request": request,
                 "order": order,
-                "error": "Invalid payment method selected",
+                "error": error,
             },
             status_code=400,
         )
     
-    # Validate payment details based on method
-    if payment_method in ["CREDIT_CARD", "DEBIT_CARD"]:
-        if not card_number or not card_name or not card_expiry or not card_cvv:
-            return templates.TemplateResponse(
-                "payment.html",
-                {
-                    "request": request,
-                    "order": order,
-                    "error": "Please fill all card details",
-                },
-                status_code=400,
-            )
-        # Basic card validation (demo - in real app, use proper validation)
-        if len(card_number.replace(" ", "")) < 13:
-            return templates.TemplateResponse(
-                "payment.html",
-                {
-                    "request": request,
-                    "order": order,
-                    "error": "Invalid card number",
-                },
-                status_code=400,
-            )
-    elif payment_method == "UPI":
-        if not upi_id or "@" not in upi_id:
-            return templates.TemplateResponse(
-                "payment.html",
-                {
-                    "request": request,
-                    "order": order,
-                    "error": "Please enter a valid UPI ID",
-                },
-                status_code=400,
-            )
-    elif payment_method == "WALLET":
-        if not wallet_provider:
-            return templates.TemplateResponse(
-                "payment.html",
-                {
-                    "request": request,
-                    "order": order,
-                    "error": "Please select a wallet provider",
-                },
-                status_code=400,
-            )
-    
-    # Simulate payment processing (in real app, integrate with payment gateway)
-    # For demo: 90% success rate
-    payment_success = random.random() > 0.1
-    
-    # Create payment record
-    transaction_id = "TXN" + "".join(random.choices(string.ascii_uppercase + string.digits, k=12))
-    payment = Payment(
-        order_id=order.id,
-        amount_cents=order.total_cents,
-        payment_method=payment_method,
-        payment_status="SUCCESS" if payment_success else "FAILED",
-        transaction_id=transaction_id,
-        completed_at=datetime.utcnow() if payment_success else None,
-    )
-    session.add(payment)
-    
-    if payment_success:
-        # Update order status
-        order.payment_status = "PAID"
-        order.status = "PLACED"
-        
-        # Decrement stock
-        for order_item in order.items:
-            item = session.get(Item, order_item.item_id)
-            if item:
-                item.stock -= order_item.quantity
-        
-        # Clear cart
-        cart_items = session.exec(select(CartItem).where(CartItem.user_id == user.id)).all()
-        for ci in cart_items:
-            session.delete(ci)
-        
-        session.commit()
-        return RedirectResponse(url=f"/payment/{order_id}/success", status_code=303)
-    else:
-        session.commit()
+    try:
+        payment = await charge_order(session, order, user.id, payment_method)
+    except (AlreadyPaid, NotAwaitingPayment):
+        return RedirectResponse(url=f"/orders/{order_id}", status_code=303)
+    except OrderExpired:
         return templates.TemplateResponse(
             "payment.html",
             {
                 "request": request,
                 "order": order,
-                "error": "Payment failed. Please try again or use a different payment method.",
+                "error": EXPIRED_MESSAGE,
             },
-            status_code=400,
+            status_code=409,
         )
+    except OutOfStock as e:
+        await session.refresh(order)
+        return templates.TemplateResponse(
+            "payment.html",
+            {
+                "request": request,
+                "order": order,
+                "error": f"{e}. You have not been charged.",
+            },
+            status_code=409,
+        )
+
+    if payment.payment_status == "SUCCESS":
+        return RedirectResponse(url=f"/payment/{order_id}/success", status_code=303)
+    return templates.TemplateResponse(
+        "payment.html",
+        {
+            "request": request,
+            "order": order,
+            "error": "Payment failed. Please try again or use a different payment method.",
+        },
+        status_code=400,
+    )
 
 @router.get("/{order_id}/success")
-async def payment_success(order_id: int, request: Request, session: Session = Depends(get_session), user: User = Depends(get_current_user)):
+async def payment_success(order_id: int, request: Request, session: AsyncSession = Depends(get_session), user: Principal = Depends(get_current_user)):
     """Show payment success page"""
-    order = session.get(Order, order_id)
+    order = await session.get(Order, order_id)
     if not order or order.user_id != user.id:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    payment = session.exec(select(Payment).where(Payment.order_id == order.id).order_by(Payment.created_at.desc())).first()
+    payment = (await session.exec(select(Payment).where(Payment.order_id == order.id).order_by(Payment.created_at.desc()))).first()
     
     return templates.TemplateResponse(
         "payment_success.html",
@@ -0,0 +1,189 @@
+"""
+Read-only sales reports (/reports) for dashboards, served from the daily
+summary tables in app.analytics rather than from orders.
+
+Every endpoint takes an inclusive `from`/`to` range of UTC days (default:
+today), capped at MAX_REPORT_DAYS, so the work is bounded by the number of
+days and distinct items sold, never by order history. Requires ADMIN_TOKEN.
+"""
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..models import Category, DailyCategorySales, DailyItemSales, DailyPaymentMethodSales, Item
+from ..security import get_read_session, require_admin
+
+router = APIRouter(default_response_class=ORJSONResponse, dependencies=[Depends(require_admin)])
+
+MAX_REPORT_DAYS = 366
+MAX_TOP_ITEMS = 100
+
+_item_sales = DailyItemSales.__table__
+_category_sales = DailyCategorySales.__table__
+_method_sales = DailyPaymentMethodSales.__table__
+_item = Item.__table__
+_category = Category.__table__
+
+def report_range(day_from: Optional[date], day_to: Optional[date]) -> tuple[date, date]:
+    """Inclusive (from, to); a missing end defaults to the other one, or to today (UTC)."""
+    day_to = day_to or day_from or datetime.utcnow().date()
+    day_from = day_from or day_to
+    if day_from > day_to:
+        raise HTTPException(status_code=400, detail="`from` is after `to`")
+    if (day_to - day_from).days >= MAX_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"Reports cover at most {MAX_REPORT_DAYS} days")
+    return day_from, day_to
+
+def _range_json(day_from: date, day_to: date) -> dict:
+    return {"from": day_from.isoformat(), "to": day_to.isoformat()}
+
+@router.get("/daily")
+async def daily_totals(
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Units and revenue per day, with successful and declined payment counts; days without sales included."""
+    day_from, day_to = report_range(date_from, date_to)
+    sales = await session.execute(
+        select(_category_sales.c.day, func.sum(_category_sales.c.units), func.sum(_category_sales.c.revenue_cents))
+        .where(_category_sales.c.day.between(day_from, day_to))
+        .group_by(_category_sales.c.day)
+    )
+    payments = await session.execute(
+        select(_method_sales.c.day, func.sum(_method_sales.c.payments), func.sum(_method_sales.c.declined))
+        .where(_method_sales.c.day.between(day_from, day_to))
+        .group_by(_method_sales.c.day)
+    )
+    by_day = {day: (units, revenue) for day, units, revenue in sales.all()}
+    attempts = {day: (paid, declined) for day, paid, declined in payments.all()}
+    days = []
+    for offset in range((day_to - day_from).days + 1):
+        day = day_from + timedelta(days=offset)
+        units, revenue = by_day.get(day, (0, 0))
+        paid, declined = attempts.get(day, (0, 0))
+        days.append({
+            "day": day.isoformat(),
+            "units": units,
+            "revenue_cents": revenue,
+            "payments": paid,
+            "declined_payments": declined,
+        })
+    return ORJSONResponse({**_range_json(day_from, day_to), "days": days})
+
+@router.get("/items/top")
+async def top_items(
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
+    by: Literal["revenue", "units"] = Query(default="revenue"),
+    limit: int = Query(default=10, ge=1, le=MAX_TOP_ITEMS),
+    session: AsyncSession = Depends(get_read_session),
+):
+    day_from, day_to = report_range(date_from, date_to)
+    units = func.sum(_item_sales.c.units).label("units")
+    revenue = func.sum(_item_sales.c.revenue_cents).label("revenue_cents")
+    orders = func.sum(_item_sales.c.orders).label("orders")
+    ranked = (
+        select(_item_sales.c.item_id, units, revenue, orders)
+        .where(_item_sales.c.day.between(day_from, day_to))
+        .group_by(_item_sales.c.item_id)
+        .order_by((revenue if by == "revenue" else units).desc(), _item_sales.c.item_id)
+        .limit(limit)
+        .subquery()
+    )
+    rows = (await session.execute(
+        select(ranked, _item.c.name)
+        .select_from(ranked.outerjoin(_item, _item.c.id == ranked.c.item_id))
+        .order_by((ranked.c.revenue_cents if by == "revenue" else ranked.c.units).desc(), ranked.c.item_id)
+    )).all()
+    return ORJSONResponse({
+        **_range_json(day_from, day_to),
+        "by": by,
+        "items": [
+            {
+                "item_id": row.item_id,
+                "name": row.name,
+                "units": row.units,
+                "revenue_cents": row.revenue_cents,
+                "orders": row.orders,
+            }
+            for row in rows
+        ],
+    })
+
+@router.get("/categories")
+async def category_sales(
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Revenue per category, highest first; category_id null is items without a category."""
+    day_from, day_to = report_range(date_from, date_to)
+    totals = (
+        select(
+            _category_sales.c.category_id,
+            func.sum(_category_sales.c.units).label("units"),
+            func.sum(_category_sales.c.revenue_cents).label("revenue_cents"),
+            func.sum(_category_sales.c.orders).label("orders"),
+        )
+        .where(_category_sales.c.day.between(day_from, day_to))
+        .group_by(_category_sales.c.category_id)
+        .subquery()
+    )
+    rows = (await session.execute(
+        select(totals, _category.c.name)
+        .select_from(totals.outerjoin(_category, _category.c.id == totals.c.category_id))
+        .order_by(totals.c.revenue_cents.desc(), totals.c.category_id)
+    )).all()
+    return ORJSONResponse({
+        **_range_json(day_from, day_to),
+        "categories": [
+            {
+                "category_id": row.category_id or None,
+                "name": row.name,
+                "units": row.units,
+                "revenue_cents": row.revenue_cents,
+                "orders": row.orders,
+            }
+            for row in rows
+        ],
+    })
+
+@router.get("/payment-methods")
+async def payment_method_mix(
+    date_from: date | None = Query(default=None, alias="from"),
+    date_to: date | None = Query(default=None, alias="to"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Successful payments, amount and declines per payment method, with each method's share of the amount."""
+    day_from, day_to = report_range(date_from, date_to)
+    rows = (await session.execute(
+        select(
+            _method_sales.c.payment_method,
+            func.sum(_method_sales.c.payments).label("payments"),
+            func.sum(_method_sales.c.amount_cents).label("amount_cents"),
+            func.sum(_method_sales.c.declined).label("declined"),
+        )
+        .where(_method_sales.c.day.between(day_from, day_to))
+        .group_by(_method_sales.c.payment_method)
+        .order_by(func.sum(_method_sales.c.amount_cents).desc(), _method_sales.c.payment_method)
+    )).all()
+    total = sum(row.amount_cents for row in rows)
+    return ORJSONResponse({
+        **_range_json(day_from, day_to),
+        "amount_cents": total,
+        "methods": [
+            {
+                "payment_method": row.payment_method,
+                "payments": row.payments,
+                "amount_cents": row.amount_cents,
+                "declined": row.declined,
+                "share": round(row.amount_cents / total, 4) if total else 0,
+            }
+            for row in rows
+        ],
+    })
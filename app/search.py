@@ -0,0 +1,54 @@
+"""
+Full-text search over Item.name / Item.description.
+
+On SQLite this is an external-content FTS5 table (`item_fts`) kept in sync with
+`item` by triggers, so search never scans the item table. Other databases fall
+back to a LIKE filter.
+"""
+import re
+
+from sqlalchemy import Connection, text
+
+ITEM_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5(
+        name, description, content='item', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS item_fts_ai AFTER INSERT ON item BEGIN
+        INSERT INTO item_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS item_fts_ad AFTER DELETE ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    # Only text columns feed the index, so stock/price writes don't touch it
+    """CREATE TRIGGER IF NOT EXISTS item_fts_au AFTER UPDATE OF name, description ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO item_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def ensure_item_search_index(conn: Connection) -> None:
+    """Create the FTS5 table and triggers if missing, rebuilding from `item` on first creation."""
+    if conn.dialect.name != "sqlite":
+        return
+    existed = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'item_fts'")).first() is not None
+    for statement in ITEM_FTS_DDL:
+        conn.execute(text(statement))
+    if not existed:
+        conn.execute(text("INSERT INTO item_fts(item_fts) VALUES ('rebuild')"))
+
+def search_terms(q: str) -> list[str]:
+    return _TOKEN_RE.findall(q)[:8]
+
+def fts_match_expression(q: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    Every word must match; the last one is treated as a prefix so search-as-you-type works.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return ""
+    quoted = ['"' + t.replace('"', '""') + '"' for t in terms]
+    quoted[-1] += "*"
+    return " AND ".join(quoted)
@@ -1,4 +1,10 @@
+import hmac
 import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import jwt, JWTError
@@ -6,20 +12,50 @@ import bcrypt
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .database import engine
+from .consistency import pinned_to_primary
+from .database import BlockingSession, async_engine, async_read_engine, engine, read_engine
+from .metrics import phase_timer
 from .models import User
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "300"))
+# Shared secret for operator endpoints (reports, bulk inventory); unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_session():
-    with Session(engine) as session:
+@asynccontextmanager
+async def _open_session(async_db_engine, sync_db_engine):
+    # expire_on_commit=False: async sessions can't lazily reload attributes after commit
+    if async_db_engine is not None:
+        async with AsyncSession(async_db_engine, expire_on_commit=False) as session:
+            yield session
+    else:
+        with Session(sync_db_engine, expire_on_commit=False) as session:
+            yield BlockingSession(session)
+
+async def get_session():
+    async with _open_session(async_engine, engine) as session:
+        yield session
+
+async def get_read_session(request: Request):
+    """Session for handlers that only read: the read engine, unless this client has just written."""
+    if pinned_to_primary(request):
+        db_engines = (async_engine, engine)
+    else:
+        db_engines = (async_read_engine, read_engine)
+    async with _open_session(*db_engines) as session:
         yield session
 
+def open_read_session():
+    """A read session for work that outlives the request's dependencies, such as a streamed export."""
+    return _open_session(async_read_engine, read_engine)
+
 def validate_password(password: str) -> tuple[bool, str]:
     """
     Validate password and return (is_valid, error_message)
@@ -103,15 +139,72 @@ def create_access_token(subject: str, expires_delta: Optional[timedelta] = None)
     to_encode = {"sub": subject, "exp": expire}
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(request: Request, session: Session = Depends(get_session)) -> User:
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as handlers see it: just enough to scope queries."""
+    id: int
+    email: str
+
+class PrincipalCache:
+    """
+    Bounded LRU of verified tokens -> Principal.
+
+    A hit skips both the JWT signature check and the user lookup. Entries live
+    for PRINCIPAL_CACHE_TTL seconds at most and never past the token's own
+    expiry, so a user removed in another worker is noticed within the TTL.
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[Principal, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            principal, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return principal
+
+    def put(self, token: str, principal: Principal, token_exp: Optional[float]) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        with self._lock:
+            self._entries[token] = (principal, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+principal_cache = PrincipalCache()
+
+def token_from_request(request: Request) -> Optional[str]:
     auth_header = request.headers.get("Authorization")
-    token = None
     if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ", 1)[1]
-    else:
-        cookie_val = request.cookies.get("access_token")
-        if cookie_val and cookie_val.startswith("Bearer "):
-            token = cookie_val.split(" ", 1)[1]
+        return auth_header.split(" ", 1)[1]
+    cookie_val = request.cookies.get("access_token")
+    if cookie_val and cookie_val.startswith("Bearer "):
+        return cookie_val.split(" ", 1)[1]
+    return None
+
+async def get_current_user(request: Request, session: AsyncSession = Depends(get_session)) -> Principal:
+    with phase_timer("auth"):
+        return await _authenticate(request, session)
+
+async def _authenticate(request: Request, session: AsyncSession) -> Principal:
+    token = token_from_request(request)
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -119,6 +212,9 @@ async def get_current_user(request: Request, session: Session = Depends(get_sess
     )
     if not token:
         raise credentials_exception
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")  # type: ignore
@@ -126,7 +222,27 @@ async def get_current_user(request: Request, session: Session = Depends(get_sess
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = session.exec(select(User).where(User.email == email)).first()
-    if user is None:
+    row = (await session.exec(select(User.id, User.email).where(User.email == email))).first()
+    if row is None:
         raise credentials_exception
-    return user
+    principal = Principal(id=row.id, email=row.email)
+    principal_cache.put(token, principal, payload.get("exp"))
+    return principal
+
+def require_admin(request: Request) -> None:
+    """
+    Dependency for operator endpoints: `Authorization: Bearer <ADMIN_TOKEN>` or
+    `X-Admin-Token: <ADMIN_TOKEN>`. They answer 404 while ADMIN_TOKEN is unset.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    token = request.headers.get("X-Admin-Token", "")
+    auth_header = request.headers.get("Authorization", "")
+    if not token and auth_header.startswith("Bearer "):
+        token = auth_header.split(" ", 1)[1]
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Admin token required",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
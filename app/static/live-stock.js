@@ -0,0 +1,58 @@
+// Keeps the stock shown on the browse page current without reloading it.
+// Subscribes to /items/stream for the cards on the page and redraws each
+// card's stock line, quantity limit and button the way items.html renders them.
+(function () {
+  "use strict";
+
+  var cards = {};
+  document.querySelectorAll("[data-item-id]").forEach(function (card) {
+    cards[card.getAttribute("data-item-id")] = card;
+  });
+  var ids = Object.keys(cards);
+  if (!ids.length || !window.EventSource) {
+    return;
+  }
+
+  function render(card, stock) {
+    var line = card.querySelector(".stock");
+    var quantity = card.querySelector("input[name=quantity]");
+    var button = card.querySelector("button[type=submit]");
+    if (line) {
+      line.className = stock <= 5 ? "stock low" : "stock";
+      line.textContent = stock > 0 ? "✓ " + stock + " in stock" : "✗ Out of stock";
+    }
+    if (quantity) {
+      quantity.max = stock;
+    }
+    if (button) {
+      button.disabled = stock <= 0;
+      button.textContent = stock > 0 ? "Add to Cart" : "Out of Stock";
+    }
+  }
+
+  var source = null;
+
+  function connect() {
+    source = new EventSource("/items/stream?ids=" + ids.join(","));
+    source.addEventListener("stock", function (event) {
+      var levels = JSON.parse(event.data);
+      Object.keys(levels).forEach(function (id) {
+        if (cards[id]) {
+          render(cards[id], levels[id]);
+        }
+      });
+    });
+  }
+
+  // Don't hold a connection open for a page nobody is looking at; the stream
+  // starts with a snapshot, so reconnecting on return catches up
+  window.addEventListener("pagehide", function () {
+    source.close();
+  });
+  window.addEventListener("pageshow", function (event) {
+    if (event.persisted) {
+      connect();
+    }
+  });
+  connect();
+})();
@@ -0,0 +1,76 @@
+"""
+Incrementally maintained per-user order summaries.
+
+The orders page header (order count, lifetime spend, last order) is read from
+one UserOrderSummary row instead of aggregating the user's whole history.
+The row is upserted in the same transaction as the change it describes: when
+an order is placed and when it is completed (paid, or placed without a
+payment step). Its revision is bumped on every change, so it doubles as the
+version of the user's order list for ETags.
+"""
+from sqlalchemy import Connection, text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .database import DIALECT
+from .models import Order, UserOrderSummary
+
+if DIALECT == "postgresql":
+    from sqlalchemy.dialects.postgresql import insert as upsert
+else:
+    from sqlalchemy.dialects.sqlite import insert as upsert
+
+# Orders in these states don't count towards order_count / lifetime spend
+NOT_COMPLETED_STATUSES = ("PENDING_PAYMENT", "CANCELLED", "EXPIRED")
+
+_summary = UserOrderSummary.__table__
+
+async def record_order_placed(session: AsyncSession, order: Order) -> None:
+    """Make `order` the user's last order; call after flushing it, before the commit."""
+    stmt = upsert(_summary).values(
+        user_id=order.user_id, last_order_id=order.id, last_order_at=order.created_at, revision=1
+    )
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[_summary.c.user_id],
+        set_={
+            "last_order_id": stmt.excluded.last_order_id,
+            "last_order_at": stmt.excluded.last_order_at,
+            "revision": _summary.c.revision + 1,
+        },
+    ))
+
+async def record_order_completed(session: AsyncSession, order: Order) -> None:
+    """Add a completed order to the user's count and spend, inside the completing transaction."""
+    stmt = upsert(_summary).values(
+        user_id=order.user_id,
+        order_count=1,
+        lifetime_spend_cents=order.total_cents,
+        last_order_id=order.id,
+        last_order_at=order.created_at,
+        revision=1,
+    )
+    await session.execute(stmt.on_conflict_do_update(
+        index_elements=[_summary.c.user_id],
+        set_={
+            "order_count": _summary.c.order_count + 1,
+            "lifetime_spend_cents": _summary.c.lifetime_spend_cents + stmt.excluded.lifetime_spend_cents,
+            "revision": _summary.c.revision + 1,
+        },
+    ))
+
+def backfill_order_summaries(conn: Connection) -> None:
+    """Rebuild every summary row from the orders table (used by the migration that adds them)."""
+    not_completed = ", ".join(f"'{status}'" for status in NOT_COMPLETED_STATUSES)
+    conn.execute(text("DELETE FROM userordersummary"))
+    conn.execute(text(f"""
+        INSERT INTO userordersummary
+            (user_id, order_count, lifetime_spend_cents, last_order_id, last_order_at, revision)
+        SELECT o.user_id,
+               SUM(CASE WHEN o.status NOT IN ({not_completed}) THEN 1 ELSE 0 END),
+               SUM(CASE WHEN o.status NOT IN ({not_completed}) THEN o.total_cents ELSE 0 END),
+               (SELECT l.id FROM "order" l WHERE l.user_id = o.user_id
+                ORDER BY l.created_at DESC, l.id DESC LIMIT 1),
+               MAX(o.created_at),
+               1
+        FROM "order" o
+        GROUP BY o.user_id
+    """))
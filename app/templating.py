@@ -0,0 +1,162 @@
+"""
+The single Jinja2 environment shared by every router.
+
+- One template cache, so base.html is parsed once per worker instead of once per router.
+- A persistent bytecode cache (TEMPLATE_BYTECODE_CACHE_DIR) so freshly started
+  workers skip parsing and compiling templates altogether.
+- A `{% cache name, version, key... %}...{% endcache %}` tag for fragments that are
+  expensive but rarely change. Fragments are tagged with the version passed in
+  and re-rendered once it changes; pass a digest of the rows the fragment
+  renders (not the catalog version), so a fragment can never be older than
+  the data the page just loaded.
+- Nothing is built at import: the environment (and its cache directory) is
+  created on the first render, keeping it out of worker start-up.
+- StreamingTemplateResponse for long pages: the document head goes out before
+  the rest is rendered, and the page is never held in memory as one string.
+"""
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template, nodes
+from jinja2.ext import Extension
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+from .assets import static_url
+from .cache import CatalogCache
+from .metrics import phase_timer, record_phase
+
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+# Unset: Jinja's own per-user directory under the temp dir (created 0700, owner
+# checked). Set: a directory the app owns, e.g. under its state dir. Empty: off.
+TEMPLATE_BYTECODE_CACHE_DIR = os.getenv("TEMPLATE_BYTECODE_CACHE_DIR")
+FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "512"))
+TEMPLATE_STREAM_CHUNK_SIZE = int(os.getenv("TEMPLATE_STREAM_CHUNK_SIZE", "8192"))
+
+# Same TTL as the catalog cache, so other workers' stock changes show up in time
+fragment_cache = CatalogCache(maxsize=FRAGMENT_CACHE_SIZE)
+
+class FragmentCacheExtension(Extension):
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        if len(args) < 2:
+            parser.fail("cache tag needs at least a name and a version", lineno)
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(self.call_method("_cache_support", [nodes.List(args)]), [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, args, caller):
+        name, version, *parts = args
+        key = (name, *parts)
+        rendered = fragment_cache.get(key, version)
+        if rendered is None:
+            rendered = caller()
+            fragment_cache.set(key, rendered, version)
+        return rendered
+
+def _bytecode_cache():
+    if TEMPLATE_BYTECODE_CACHE_DIR is None:
+        return FileSystemBytecodeCache()
+    if not TEMPLATE_BYTECODE_CACHE_DIR:
+        return None
+    os.makedirs(TEMPLATE_BYTECODE_CACHE_DIR, mode=0o700, exist_ok=True)
+    return FileSystemBytecodeCache(TEMPLATE_BYTECODE_CACHE_DIR)
+
+@lru_cache(maxsize=1)
+def get_env() -> Environment:
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=True,
+        bytecode_cache=_bytecode_cache(),
+        extensions=[FragmentCacheExtension],
+    )
+    env.globals["static_url"] = static_url
+    return env
+
+class StreamingTemplateResponse(StreamingResponse):
+    """
+    Renders with Template.generate() while the body is being sent.
+
+    Everything up to `</head>` is sent as soon as it is rendered, so the browser
+    can start fetching the stylesheet; the rest goes out in chunks of about
+    `chunk_size` characters. Whatever the template reads must already be loaded:
+    the request's database session is closed by the time the body renders.
+
+    Rendering time is recorded in the request's "template" phase once the body
+    is done, which is after the headers went out: it reaches the /metrics
+    histograms but not the page's Server-Timing header.
+    """
+
+    def __init__(
+        self,
+        template: Template,
+        context: dict,
+        status_code: int = 200,
+        headers: dict[str, str] | None = None,
+        background: BackgroundTask | None = None,
+        chunk_size: int = TEMPLATE_STREAM_CHUNK_SIZE,
+    ):
+        self.template = template
+        self.context = context
+        self.chunk_size = chunk_size
+        super().__init__(self._render(), status_code=status_code, headers=headers, media_type="text/html", background=background)
+
+    async def _render(self):
+        # An async generator, so rendering stays on the event loop instead of a thread per chunk
+        rendering = 0.0
+        started = time.perf_counter()
+        pending: list[str] = []
+        size = 0
+        head_sent = False
+        for piece in self.template.generate(self.context):
+            pending.append(piece)
+            size += len(piece)
+            if size >= self.chunk_size or (not head_sent and "</head>" in piece):
+                head_sent = True
+                chunk = "".join(pending).encode("utf-8")
+                pending.clear()
+                size = 0
+                rendering += time.perf_counter() - started
+                yield chunk
+                started = time.perf_counter()
+        rendering += time.perf_counter() - started
+        record_phase("template", rendering)
+        if pending:
+            yield "".join(pending).encode("utf-8")
+
+class TimedTemplates(Jinja2Templates):
+    """Jinja2Templates that accounts rendering time to the request's "template" phase."""
+
+    def TemplateResponse(self, *args, **kwargs):
+        with phase_timer("template"):
+            return super().TemplateResponse(*args, **kwargs)
+
+    def StreamingTemplateResponse(
+        self,
+        name: str,
+        context: dict,
+        status_code: int = 200,
+        headers: dict[str, str] | None = None,
+    ) -> StreamingTemplateResponse:
+        """Same arguments as TemplateResponse(name, context, ...), rendered while streaming."""
+        return StreamingTemplateResponse(self.get_template(name), context, status_code=status_code, headers=headers)
+
+class LazyTemplates:
+    """Stands in for TimedTemplates and builds it on first use."""
+
+    def __init__(self):
+        self._templates: TimedTemplates | None = None
+
+    def __getattr__(self, name):
+        if self._templates is None:
+            self._templates = TimedTemplates(env=get_env())
+        return getattr(self._templates, name)
+
+templates = LazyTemplates()
@@ -0,0 +1,42 @@
+"""
+Rebuild the daily sales summaries behind /reports from order and payment history.
+
+The summaries are normally kept up to date as sales happen; run this after
+importing historical orders, after fixing data by hand, or if the totals are
+ever suspected to have drifted. It runs in one transaction (on SQLite one that
+holds the write lock), so reports never see a half-built table.
+
+Usage: python scripts/backfill_reports.py
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import func, select
+
+from app.analytics import rebuild_sales_summaries
+from app.database import engine
+from app.migrations import ensure_schema
+from app.models import DailyCategorySales, DailyItemSales, DailyPaymentMethodSales
+
+def main() -> int:
+    ensure_schema(engine)
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        with conn.begin():
+            if conn.dialect.name == "sqlite":
+                conn.exec_driver_sql("BEGIN IMMEDIATE")
+            rebuild_sales_summaries(conn)
+        counts = {
+            model.__tablename__: conn.execute(select(func.count()).select_from(model)).scalar_one()
+            for model in (DailyItemSales, DailyCategorySales, DailyPaymentMethodSales)
+        }
+    print(f"Rebuilt sales summaries in {time.perf_counter() - started:.2f}s")
+    for table, rows in counts.items():
+        print(f"  {table}: {rows} rows")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Concurrent-request latency: sync (blocking) session mode vs async engine mode.
+
+Each mode runs in its own subprocess against a fresh SQLite file. The app is
+driven in-process over ASGI with `--concurrency` simultaneous requests to a
+DB-heavy page (/orders for a user with many orders) while a DB-free page (/)
+is probed in parallel. In sync mode every query blocks the event loop; in
+async mode the loop stays free, but each query pays for the hop to the driver,
+so compare both the probe and the DB-heavy page before choosing a mode.
+
+Usage: python scripts/bench_async.py [--requests 400] [--concurrency 32] [--orders 300]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+MODES = {
+    "sync": "sqlite:///{path}",
+    "async": "sqlite+aiosqlite:///{path}",
+}
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+    }
+
+async def drive(args) -> dict:
+    import httpx
+    from sqlmodel import Session
+
+    from app.database import create_db_and_tables, engine
+    from app.main import app
+    from app.models import Order, User
+    from app.security import create_access_token, hash_password
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        user = User(email="bench@example.com", hashed_password=hash_password("password123"))
+        session.add(user)
+        session.flush()
+        session.add_all(Order(user_id=user.id, total_cents=100 * i, tracking_id=f"T{i}") for i in range(args.orders))
+        session.commit()
+    cookies = {"access_token": f"Bearer {create_access_token('bench@example.com')}"}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", cookies=cookies) as client:
+        await client.get("/orders")  # warm up templates and connections
+        heavy: list[float] = []
+        probe: list[float] = []
+        gate = asyncio.Semaphore(args.concurrency)
+        done = asyncio.Event()
+
+        async def heavy_request() -> None:
+            async with gate:
+                started = time.perf_counter()
+                response = await client.get("/orders")
+                response.raise_for_status()
+                heavy.append(time.perf_counter() - started)
+
+        async def prober() -> None:
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/")
+                probe.append(time.perf_counter() - started)
+                await asyncio.sleep(0.005)
+
+        probe_task = asyncio.create_task(prober())
+        started = time.perf_counter()
+        await asyncio.gather(*(heavy_request() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return {
+        "requests_per_sec": round(args.requests / elapsed, 1),
+        "orders_page": summarize(heavy),
+        "home_page_probe": summarize(probe),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--orders", type=int, default=300, help="orders in the benchmark user's history")
+    parser.add_argument("--worker", choices=sorted(MODES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        sys.path.insert(0, str(ROOT))
+        os.chdir(ROOT)
+        print(json.dumps(asyncio.run(drive(args))))
+        return
+
+    for mode, url in MODES.items():
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        env = dict(os.environ, DATABASE_URL=url.format(path=path))
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", mode, "--requests", str(args.requests),
+             "--concurrency", str(args.concurrency), "--orders", str(args.orders)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        print(mode, json.loads(output.strip().splitlines()[-1]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Concurrency benchmark for checkout: oversell and orders/sec.
+
+Many users race to buy a few hot items with limited stock. The same workload
+runs through the old read-check-write checkout (session.get per line, stock
+compared in Python, two commits) and through app.inventory.place_order_from_cart
+(conditional UPDATE ... WHERE stock >= :q, one commit).
+
+Usage: python scripts/bench_checkout.py [--users 200] [--threads 16] [--stock 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from uuid import uuid4
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, func
+from sqlmodel import Session, SQLModel, select
+
+from app.database import BlockingSession
+from app.inventory import OutOfStock, place_order_from_cart
+from app.models import CartItem, Item, Order, OrderItem, User
+
+HOT_ITEMS = 3
+
+def legacy_checkout(session: Session, user_id: int) -> bool:
+    """The checkout write path as it was before inventory.place_order_from_cart."""
+    cart_items = session.exec(select(CartItem).where(CartItem.user_id == user_id)).all()
+    for ci in cart_items:
+        item = session.get(Item, ci.item_id)
+        if not item or item.stock < ci.quantity:
+            return False
+    order = Order(user_id=user_id, status="PLACED", tracking_id=str(uuid4()))
+    session.add(order)
+    session.commit()
+    session.refresh(order)
+    total_cents = 0
+    for ci in cart_items:
+        item = session.get(Item, ci.item_id)
+        item.stock -= ci.quantity
+        total_cents += item.price_cents * ci.quantity
+        session.add(OrderItem(order_id=order.id, item_id=item.id, quantity=ci.quantity, price_cents_each=item.price_cents))
+        session.delete(ci)
+    order.total_cents = total_cents
+    session.add(order)
+    session.commit()
+    return True
+
+def atomic_checkout(session: Session, user_id: int) -> bool:
+    try:
+        order = asyncio.run(place_order_from_cart(BlockingSession(session), user_id, status="PLACED"))
+        return order is not None
+    except OutOfStock:
+        return False
+
+def setup(path: str, users: int, stock: int):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        items = [Item(name=f"Hot {i}", price_cents=500, stock=stock) for i in range(HOT_ITEMS)]
+        session.add_all(items)
+        session.flush()
+        user_ids = []
+        for u in range(users):
+            user = User(email=f"bench{u}@example.com", hashed_password="x")
+            session.add(user)
+            session.flush()
+            user_ids.append(user.id)
+            for item in items:
+                session.add(CartItem(user_id=user.id, item_id=item.id, quantity=1))
+        session.commit()
+    return engine, user_ids
+
+def run(name: str, checkout, users: int, threads: int, stock: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), f"{name}.db")
+    engine, user_ids = setup(path, users, stock)
+    errors = 0
+    lock = threading.Lock()
+
+    def worker(user_id: int) -> bool:
+        nonlocal errors
+        with Session(engine) as session:
+            try:
+                return checkout(session, user_id)
+            except Exception:
+                with lock:
+                    errors += 1
+                return False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        placed = sum(pool.map(worker, user_ids))
+    elapsed = time.perf_counter() - started
+
+    with Session(engine) as session:
+        sold = session.exec(select(func.coalesce(func.sum(OrderItem.quantity), 0))).one()
+        min_stock = session.exec(select(func.min(Item.stock))).one()
+    engine.dispose()
+    return {
+        "mode": name,
+        "orders": placed,
+        "oversold_units": max(0, sold - stock * HOT_ITEMS),
+        "min_stock": min_stock,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "checkouts_per_sec": round(users / elapsed, 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--stock", type=int, default=50, help="units of each hot item")
+    args = parser.parse_args()
+    for name, fn in (("legacy", legacy_checkout), ("atomic", atomic_checkout)):
+        print(run(name, fn, args.users, args.threads, args.stock))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Mixed read/write throughput for each SQLite engine profile.
+
+Reader threads run the browse query while writer threads take stock and
+insert orders, all against the same database file, for a fixed duration.
+Reports reads/sec, writes/sec and how many operations failed with
+"database is locked".
+
+Usage: python scripts/bench_sqlite_profile.py [--seconds 5] [--readers 8] [--writers 4] [--items 2000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, SQLModel
+
+from app.database import SQLITE_PROFILES, make_engine
+from app.models import Category, Item
+
+def setup(url: str, profile: str, items: int):
+    engine = make_engine(url, profile)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        cat = Category(name="Bench")
+        session.add(cat)
+        session.flush()
+        session.add_all(
+            Item(name=f"Item {i:05d}", description="bench item", price_cents=100 + i, stock=10**9, category_id=cat.id)
+            for i in range(items)
+        )
+        session.commit()
+    return engine
+
+def run(profile: str, args) -> dict:
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    engine = setup(url, profile, args.items)
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def bump(key: str) -> None:
+        with lock:
+            counts[key] += 1
+
+    def reader() -> None:
+        rng = random.Random()
+        while not stop.is_set():
+            try:
+                with engine.connect() as conn:
+                    start = f"Item {rng.randrange(args.items):05d}"
+                    conn.execute(
+                        text("SELECT id, name, price_cents, stock FROM item WHERE name >= :start ORDER BY name LIMIT 24"),
+                        {"start": start},
+                    ).all()
+                bump("reads")
+            except OperationalError:
+                bump("locked")
+
+    def writer() -> None:
+        rng = random.Random()
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    for _ in range(3):
+                        conn.execute(
+                            text("UPDATE item SET stock = stock - 1 WHERE id = :id AND stock >= 1"),
+                            {"id": rng.randrange(1, args.items + 1)},
+                        )
+                    conn.execute(
+                        text('INSERT INTO "order" (user_id, created_at, total_cents, status, tracking_id, payment_status) '
+                             "VALUES (1, CURRENT_TIMESTAMP, 300, 'PLACED', 'bench', 'PAID')")
+                    )
+                bump("writes")
+            except OperationalError:
+                bump("locked")
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return {
+        "profile": profile,
+        "reads_per_sec": round(counts["reads"] / args.seconds, 1),
+        "writes_per_sec": round(counts["writes"] / args.seconds, 1),
+        "locked_errors": counts["locked"],
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--profiles", nargs="*", default=sorted(SQLITE_PROFILES))
+    args = parser.parse_args()
+    for profile in args.profiles:
+        print(run(profile, args))
+
+if __name__ == "__main__":
+    main()
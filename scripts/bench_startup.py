@@ -0,0 +1,139 @@
+"""
+Worker cold-start time, checked against budgets.
+
+Each run is a fresh interpreter against a SQLite file that is already
+migrated, the way a recycled worker finds production:
+
+- `python -X importtime -c "import app.main"`: total import time of app.main,
+  and the import time spent in this repo's own modules (self time of app.*),
+  which is the part our code controls;
+- import plus the startup hooks (schema preflight, background tasks), timed
+  in-process, once with the one-query preflight and once with a full migrate()
+  pass for comparison.
+
+Medians over --runs are printed; any budget exceeded makes the script exit
+non-zero, so a slow new import or a heavy startup step fails CI.
+
+Usage: python scripts/bench_startup.py [--runs 5] [--budget startup_ms=150 ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Milliseconds (medians). Generous enough for a slow CI box; what they catch
+# is a step change, such as a heavy import or a migration pass on every boot.
+BUDGETS = {
+    "import_ms": 2500,
+    "app_modules_self_ms": 400,
+    "startup_ms": 50,
+}
+
+_STARTUP_SNIPPET = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+if sys.argv[1] == "migrate":
+    from app.migrations import migrate
+    app.main.ensure_schema = migrate
+
+async def boot():
+    began = time.perf_counter()
+    await app.main.app.router.startup()
+    ready = time.perf_counter()
+    await app.main.app.router.shutdown()
+    return ready - began
+
+startup = asyncio.run(boot())
+print(json.dumps({"import_s": imported - started, "startup_s": startup}))
+"""
+
+def parse_importtime(stderr: str) -> tuple[float, float, list[tuple[str, float]]]:
+    """(app.main cumulative ms, app.* self ms, [(module, self ms)]) from -X importtime output."""
+    total = 0.0
+    own: list[tuple[str, float]] = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue  # the header line
+        if name == "app.main":
+            total = cumulative_us / 1000
+        if name == "app" or name.startswith("app."):
+            own.append((name, self_us / 1000))
+    return total, sum(ms for _, ms in own), sorted(own, key=lambda item: -item[1])
+
+def run_importtime(env: dict) -> tuple[float, float, list[tuple[str, float]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+def run_startup(env: dict, mode: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SNIPPET, mode],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", action="append", default=[], metavar="NAME=MS", help=f"override a budget ({', '.join(BUDGETS)})")
+    args = parser.parse_args()
+    budgets = dict(BUDGETS)
+    for override in args.budget:
+        name, _, value = override.partition("=")
+        if name not in budgets:
+            parser.error(f"unknown budget {name!r}")
+        budgets[name] = float(value)
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{Path(tempfile.mkdtemp()) / 'startup.db'}", RESERVATION_SWEEPER="0")
+    # Migrate once and warm the bytecode caches, so runs measure a recycled worker
+    subprocess.run(
+        [sys.executable, "-c", "from app.database import create_db_and_tables; create_db_and_tables()"],
+        cwd=ROOT, env=env, check=True,
+    )
+    run_importtime(env)
+
+    imports, own, startups, migrates = [], [], [], []
+    slowest: dict[str, list[float]] = {}
+    for _ in range(args.runs):
+        total, own_ms, modules = run_importtime(env)
+        imports.append(total)
+        own.append(own_ms)
+        for name, ms in modules:
+            slowest.setdefault(name, []).append(ms)
+        startups.append(run_startup(env, "preflight"))
+        migrates.append(run_startup(env, "migrate"))
+
+    results = {
+        "import_ms": statistics.median(imports),
+        "app_modules_self_ms": statistics.median(own),
+        "startup_ms": statistics.median(s["startup_s"] for s in startups) * 1000,
+    }
+    full_migrate_ms = statistics.median(s["startup_s"] for s in migrates) * 1000
+
+    print(f"median of {args.runs} runs")
+    for name, value in results.items():
+        verdict = "ok" if value <= budgets[name] else "OVER BUDGET"
+        print(f"  {name:22} {value:8.1f} ms   budget {budgets[name]:g} ms   {verdict}")
+    print(f"  {'startup (full migrate)':22} {full_migrate_ms:8.1f} ms   for comparison")
+    print("slowest app modules (self time):")
+    for name, samples in sorted(slowest.items(), key=lambda item: -statistics.median(item[1]))[:8]:
+        print(f"  {statistics.median(samples):8.1f} ms  {name}")
+    return 0 if all(results[name] <= budgets[name] for name in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
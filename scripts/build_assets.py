@@ -0,0 +1,20 @@
+"""
+Fingerprint and pre-compress static assets ahead of deployment.
+
+The app also does this at startup; running it in the build step means workers
+find everything already in place.
+
+Usage: python scripts/build_assets.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.assets import STATIC_BUILD_DIR, brotli, build_assets
+
+if __name__ == "__main__":
+    manifest = build_assets(force=True)
+    for name, hashed in manifest.items():
+        print(f"{name} -> {hashed}")
+    print(f"Wrote {len(manifest)} assets to {STATIC_BUILD_DIR} (brotli {'on' if brotli else 'off: pip install brotli'})")
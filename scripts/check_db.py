@@ -4,6 +4,7 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from sqlmodel import Session, text
 from app.database import engine
+from app.migrations import LATEST_VERSION, current_version, pending_migrations
 
 with Session(engine) as session:
     result = session.exec(text("SELECT name FROM sqlite_master WHERE type='table'"))
@@ -24,6 +25,12 @@ with Session(engine) as session:
             print("✅ Order table has payment_status column")
         else:
             print("❌ Order table is MISSING payment_status column!")
-            print("\nTo fix: Delete data.db and restart the server")
+            print("\nTo fix: run python scripts/migrate.py")
     except Exception as e:
         print(f"Error checking order table: {e}")
+
+with engine.connect() as conn:
+    version = current_version(conn)
+print(f"\nSchema version {version} (latest {LATEST_VERSION})")
+for migration in pending_migrations(engine):
+    print(f"  pending migration {migration.version}: {migration.name}")
@@ -0,0 +1,83 @@
+"""
+Assert a maximum SQL query count for the main pages.
+
+Runs the app in-process against a throwaway SQLite database, fills a cart and
+an order with a few lines and then with many lines, and checks each endpoint
+stays within its budget either way. Any N+1 regression makes this exit non-zero.
+
+Usage: python scripts/check_query_counts.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/querycount.db"
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app.database import engine, create_db_and_tables, read_engine
+from app.main import app
+from app.models import Category, Item
+from app.querycount import assert_max_queries
+
+# GET handlers may read through read_engine; count statements on both
+ENGINES = (engine, read_engine)
+
+# Max queries per request, including the one used to resolve the logged-in user
+BUDGETS = {
+    "/cart": 2,
+    "/payment/checkout": 2,
+    "/orders": 3,
+    "/orders/{order_id}": 4,
+    "/payment/{order_id}": 2,
+}
+
+def seed_items(count: int) -> list[int]:
+    with Session(engine) as session:
+        cat = Category(name="Bench")
+        session.add(cat)
+        session.flush()
+        items = [Item(name=f"Item {i:04d}", price_cents=100 + i, stock=1000, category_id=cat.id) for i in range(count)]
+        session.add_all(items)
+        session.commit()
+        return [item.id for item in items]
+
+def check(client: TestClient, lines: int, item_ids: list[int]) -> None:
+    email = f"querycount{lines}@example.com"
+    client.post("/auth/register", data={"email": email, "password": "password123"})
+    client.post("/auth/login", data={"email": email, "password": "password123"})
+    for item_id in item_ids[:lines]:
+        client.post("/cart/add", data={"item_id": item_id, "quantity": 1})
+
+    for path in ("/cart", "/payment/checkout", "/orders"):
+        with assert_max_queries(ENGINES, BUDGETS[path], f"GET {path} with {lines} lines"):
+            assert client.get(path).status_code == 200
+
+    response = client.post("/payment/create-order", follow_redirects=False)
+    order_id = response.headers["location"].rsplit("/", 1)[-1]
+    for template in ("/orders/{order_id}", "/payment/{order_id}"):
+        path = template.format(order_id=order_id)
+        with assert_max_queries(ENGINES, BUDGETS[template], f"GET {path} with {lines} lines"):
+            assert client.get(path).status_code == 200
+
+def main() -> int:
+    create_db_and_tables()
+    item_ids = seed_items(25)
+    try:
+        for lines in (1, 25):
+            with TestClient(app) as client:
+                check(client, lines, item_ids)
+    except AssertionError as e:
+        print(f"FAIL {e}")
+        return 1
+    print("Query budgets OK:", ", ".join(f"{path}<={n}" for path, n in BUDGETS.items()))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Check stock holds end to end on a throwaway SQLite database.
+
+- Creating an order twice from the same cart (the user went back and
+  re-submitted checkout) must succeed both times: the second order replaces
+  the first, whose holds are released, instead of being refused by them.
+- Stock must end up taken exactly once, and the replaced order can't be paid.
+
+Usage: python scripts/check_reservations.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/reservations.db"
+os.environ.setdefault("ADMISSION_USER_RATE", "0")
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, func, select
+
+from app.database import create_db_and_tables, engine
+from app.main import app
+from app.models import InventoryReservation, Item, Order
+
+STOCK = 5
+QUANTITY = 3
+
+def seed_item() -> int:
+    with Session(engine) as session:
+        item = Item(name="Reserved", price_cents=100, stock=STOCK)
+        session.add(item)
+        session.commit()
+        return item.id
+
+def stock_and_holds(item_id: int) -> tuple[int, int]:
+    with Session(engine) as session:
+        stock = session.get(Item, item_id).stock
+        held = session.exec(select(func.coalesce(func.sum(InventoryReservation.quantity), 0))).one()
+        return stock, held
+
+def check_double_submit(client: TestClient, item_id: int, create_order) -> None:
+    first = create_order()
+    second = create_order()
+    stock, held = stock_and_holds(item_id)
+    assert (stock, held) == (STOCK - QUANTITY, QUANTITY), f"stock {stock}, held {held} after re-submitting"
+    with Session(engine) as session:
+        assert session.get(Order, first).status == "EXPIRED", "the replaced order should be expired"
+        assert session.get(Order, second).status == "PENDING_PAYMENT"
+    paid = client.post(f"/api/v1/orders/{first}/payments", json={"payment_method": "UPI", "upi_id": "a@b"})
+    assert paid.status_code == 409, f"paying the replaced order answered {paid.status_code}"
+
+def main() -> int:
+    create_db_and_tables()
+    item_id = seed_item()
+    with TestClient(app) as client:
+        client.post("/auth/register", data={"email": "holds@example.com", "password": "password123"})
+        client.post("/auth/login", data={"email": "holds@example.com", "password": "password123"})
+        client.post("/cart/add", data={"item_id": item_id, "quantity": QUANTITY})
+
+        def html_order() -> int:
+            response = client.post("/payment/create-order", follow_redirects=False)
+            assert response.status_code == 303, f"POST /payment/create-order answered {response.status_code}"
+            return int(response.headers["location"].rsplit("/", 1)[-1])
+
+        def api_order() -> int:
+            response = client.post("/api/v1/orders")
+            assert response.status_code == 201, f"POST /api/v1/orders answered {response.status_code}"
+            return response.json()["id"]
+
+        try:
+            check_double_submit(client, item_id, html_order)
+            check_double_submit(client, item_id, api_order)
+        except AssertionError as e:
+            print(f"FAIL {e}")
+            return 1
+    print("Reservations OK: re-submitted orders replace the earlier hold")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Check that incrementally maintained summaries agree with a rebuild from history,
+on a throwaway SQLite database.
+
+- An order placed directly (POST /orders/checkout) is already complete, so
+  trying to pay it must be refused (HTML and API) without charging it.
+- An order created for payment and then paid counts once.
+- Afterwards every UserOrderSummary row must match what
+  backfill_order_summaries() computes from the orders table, and every daily
+  sales row what rebuild_sales_summaries() computes from orders and payments.
+
+Usage: python scripts/check_summaries.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmpdir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/summaries.db"
+os.environ.setdefault("ADMISSION_USER_RATE", "0")
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+os.chdir(ROOT)
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select, text
+from sqlmodel import Session
+
+from app.analytics import rebuild_sales_summaries
+from app.database import create_db_and_tables, engine
+from app.main import app
+from app.models import Item, Payment, UserOrderSummary
+from app.summaries import backfill_order_summaries
+
+PAYMENT = {"payment_method": "UPI", "upi_id": "a@b"}
+MAX_PAYMENT_ATTEMPTS = 20  # the simulated gateway declines 10% of attempts
+
+_summary = UserOrderSummary.__table__
+SALES_TABLES = ("dailyitemsales", "dailycategorysales", "dailypaymentmethodsales")
+
+def seed_item() -> int:
+    with Session(engine) as session:
+        item = Item(name="Summarised", price_cents=250, stock=100)
+        session.add(item)
+        session.commit()
+        return item.id
+
+def summary_rows(conn) -> dict:
+    rows = conn.execute(select(
+        _summary.c.user_id, _summary.c.order_count, _summary.c.lifetime_spend_cents, _summary.c.last_order_id
+    )).all()
+    return {row.user_id: tuple(row) for row in rows}
+
+def sales_rows(conn) -> dict:
+    return {table: sorted(map(tuple, conn.execute(text(f"SELECT * FROM {table}")).all())) for table in SALES_TABLES}
+
+def payments_for(order_id: int) -> int:
+    with Session(engine) as session:
+        return len(session.exec(select(Payment.id).where(Payment.order_id == order_id)).all())
+
+def check_placed_order(client: TestClient, item_id: int) -> None:
+    client.post("/cart/add", data={"item_id": item_id, "quantity": 2})
+    response = client.post("/orders/checkout", follow_redirects=False)
+    assert response.status_code == 303, f"POST /orders/checkout answered {response.status_code}"
+    order_id = int(response.headers["location"].rsplit("/", 1)[-1])
+
+    paid = client.post(f"/api/v1/orders/{order_id}/payments", json=PAYMENT)
+    assert paid.status_code == 409, f"paying a placed order over the API answered {paid.status_code}"
+    form = client.post(
+        f"/payment/{order_id}/process", data={"payment_method": "UPI", "upi_id": "a@b"}, follow_redirects=False
+    )
+    assert form.status_code == 303, f"paying a placed order from the form answered {form.status_code}"
+    assert payments_for(order_id) == 0, "a placed order was charged"
+
+def check_paid_order(client: TestClient, item_id: int) -> None:
+    client.post("/cart/add", data={"item_id": item_id, "quantity": 1})
+    created = client.post("/api/v1/orders")
+    assert created.status_code == 201, f"POST /api/v1/orders answered {created.status_code}"
+    order_id = created.json()["id"]
+    for _ in range(MAX_PAYMENT_ATTEMPTS):
+        paid = client.post(f"/api/v1/orders/{order_id}/payments", json=PAYMENT)
+        if paid.status_code == 201:
+            break
+        assert paid.status_code == 402, f"paying the order answered {paid.status_code}"
+    else:
+        raise AssertionError(f"no payment succeeded in {MAX_PAYMENT_ATTEMPTS} attempts")
+
+def check_against_rebuild() -> None:
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            live, live_sales = summary_rows(conn), sales_rows(conn)
+            backfill_order_summaries(conn)
+            rebuild_sales_summaries(conn)
+            rebuilt, rebuilt_sales = summary_rows(conn), sales_rows(conn)
+            transaction.rollback()
+    assert live == rebuilt, f"order summaries {live} differ from a rebuild {rebuilt}"
+    for table in SALES_TABLES:
+        assert live_sales[table] == rebuilt_sales[table], (
+            f"{table} {live_sales[table]} differs from a rebuild {rebuilt_sales[table]}"
+        )
+
+def main() -> int:
+    create_db_and_tables()
+    item_id = seed_item()
+    with TestClient(app) as client:
+        client.post("/auth/register", data={"email": "sums@example.com", "password": "password123"})
+        client.post("/auth/login", data={"email": "sums@example.com", "password": "password123"})
+        try:
+            check_placed_order(client, item_id)
+            check_paid_order(client, item_id)
+            check_against_rebuild()
+        except AssertionError as e:
+            print(f"FAIL {e}")
+            return 1
+    print("Summaries OK: live summaries match a rebuild from history")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
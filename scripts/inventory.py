@@ -0,0 +1,87 @@
+"""
+Bulk inventory import / export, e.g. for the nightly supplier feed.
+
+Import matches each record by `sku` (else `name`), updates the fields it sets
+(stock, price_cents, description, category) and creates unknown items, in
+batches of --batch-size per transaction. Bad lines are listed and skipped;
+the exit status is 1 if any line failed. Export streams the whole catalog in
+the same columns.
+
+Usage:
+    python scripts/inventory.py import feed.csv [--format csv|jsonl] [--batch-size 500]
+    python scripts/inventory.py import - --format jsonl < feed.jsonl
+    python scripts/inventory.py export [--format csv|jsonl] [--output inventory.csv]
+
+Running web workers notice the changes within CATALOG_CACHE_TTL; use
+POST /inventory/import to have them refreshed at once.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlmodel import Session
+
+from app.database import BlockingSession, engine
+from app.inventory_io import FORMATS, IMPORT_BATCH_SIZE, export_inventory, import_inventory, read_records
+from app.migrations import ensure_schema
+
+def guess_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+async def run_import(path: str, fmt: str, batch_size: int) -> int:
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+    started = time.perf_counter()
+    try:
+        with Session(engine, expire_on_commit=False) as session:
+            report = await import_inventory(BlockingSession(session), read_records(stream, fmt), batch_size)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{report.rows} rows in {elapsed:.2f}s ({report.batches} batches): {report.created} created, "
+        f"{report.updated} updated, {report.unchanged} unchanged, {report.failed} failed",
+        file=sys.stderr,
+    )
+    for error in report.errors:
+        print(f"  line {error['line']}: {error['error']}", file=sys.stderr)
+    if report.failed > len(report.errors):
+        print(f"  ... and {report.failed - len(report.errors)} more", file=sys.stderr)
+    return 1 if report.failed else 0
+
+async def run_export(fmt: str, output: str | None) -> int:
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    try:
+        with Session(engine) as session:
+            async for chunk in export_inventory(BlockingSession(session), fmt):
+                out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import")
+    importer.add_argument("path", help="feed file, or - for stdin")
+    importer.add_argument("--format", choices=FORMATS, help="default: from the file extension")
+    importer.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    exporter = commands.add_parser("export")
+    exporter.add_argument("--format", choices=FORMATS, default="csv")
+    exporter.add_argument("--output", "-o", help="default: stdout")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+    if args.command == "import":
+        return asyncio.run(run_import(args.path, guess_format(args.path, args.format), max(1, args.batch_size)))
+    return asyncio.run(run_export(args.format, args.output))
+
+if __name__ == "__main__":
+    sys.exit(main())
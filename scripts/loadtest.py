@@ -0,0 +1,252 @@
+"""
+End-to-end load test of the ordering funnel.
+
+Each virtual user registers and logs in; once all have signed in, each
+repeatedly browses /items, adds an item to the cart, creates an order and pays
+for it (sign-in is timed separately, since bcrypt would otherwise dominate):
+
+    register -> login -> /items -> /cart/add -> /payment/create-order -> /payment/{id}/process
+
+By default the real app.main:app is driven in-process over ASGI against a
+fresh SQLite file (or --database-url) seeded with --items products if it has
+none; pass --url to drive a running server instead (it must already have
+items to sell). Latency percentiles per
+endpoint, status counts and orders/sec are printed and written as JSON to
+--output, so runs can be compared across commits with --compare.
+
+Usage:
+    python scripts/loadtest.py [--users 20] [--orders-per-user 5] [--items 200]
+    python scripts/loadtest.py --url http://127.0.0.1:8000 --users 50
+    python scripts/loadtest.py --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+ITEM_ID_PATTERN = re.compile(r'name="item_id" value="(\d+)"')
+PAYMENT_FORM = {"payment_method": "UPI", "upi_id": "loadtest@upi"}
+PASSWORD = "loadtest-pass1"
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def summarize(samples: list[float], statuses: dict[int, int]) -> dict:
+    return {
+        "count": len(samples),
+        "errors": sum(n for status, n in statuses.items() if status >= 500),
+        "statuses": {str(status): n for status, n in sorted(statuses.items())},
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+    }
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, client, label: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[label].append(time.perf_counter() - started)
+        self.statuses[label][response.status_code] += 1
+        return response
+
+    def report(self) -> dict:
+        return {label: summarize(samples, self.statuses[label]) for label, samples in self.latencies.items()}
+
+def seed_dataset(items: int, stock: int) -> None:
+    """Fill a fresh database with enough stock that the run measures throughput, not sell-outs."""
+    from sqlmodel import Session, select
+
+    from app.database import create_db_and_tables, engine
+    from app.models import Category, Item
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        if session.exec(select(Item.id).limit(1)).first() is not None:
+            return
+        categories = [Category(name=f"Category {i}") for i in range(max(1, items // 50))]
+        session.add_all(categories)
+        session.flush()
+        session.add_all(
+            Item(
+                name=f"Item {i:05d}",
+                description=f"Load test item {i}",
+                price_cents=100 + (i * 37) % 5000,
+                stock=stock,
+                category_id=categories[i % len(categories)].id,
+            )
+            for i in range(items)
+        )
+        session.commit()
+
+async def sign_in(client, recorder: Recorder, run_id: str, index: int) -> bool:
+    credentials = {"email": f"loadtest-{run_id}-{index}@example.com", "password": PASSWORD}
+    await recorder.request(client, "POST /auth/register", "POST", "/auth/register", data=credentials)
+    response = await recorder.request(client, "POST /auth/login", "POST", "/auth/login", data=credentials)
+    return response.status_code == 303
+
+async def shop(client, recorder: Recorder, orders: int, rng: random.Random) -> int:
+    """Browse, add to cart, order and pay `orders` times; return the number of orders paid for."""
+    paid = 0
+    for _ in range(orders):
+        page = await recorder.request(client, "GET /items", "GET", "/items")
+        item_ids = ITEM_ID_PATTERN.findall(page.text)
+        if not item_ids:
+            break
+        await recorder.request(
+            client, "POST /cart/add", "POST", "/cart/add",
+            data={"item_id": rng.choice(item_ids), "quantity": rng.randint(1, 3)},
+        )
+        response = await recorder.request(client, "POST /payment/create-order", "POST", "/payment/create-order")
+        if response.status_code != 303:
+            continue
+        order_id = response.headers["location"].rstrip("/").rsplit("/", 1)[1]
+        response = await recorder.request(
+            client, "POST /payment/{id}/process", "POST", f"/payment/{order_id}/process", data=PAYMENT_FORM
+        )
+        paid += response.status_code == 303
+    return paid
+
+async def run(args) -> dict:
+    import httpx
+
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        seed_dataset(args.items, args.stock)
+        from app.main import app
+
+        transport, base_url = httpx.ASGITransport(app=app), "http://loadtest"
+
+    recorder = Recorder()
+    run_id = f"{int(time.time())}{os.getpid()}"
+    rng = random.Random(args.seed)
+    gate = asyncio.Semaphore(args.concurrency)
+    # One client per user so each keeps its own login cookie
+    clients = [
+        httpx.AsyncClient(transport=transport, base_url=base_url, follow_redirects=False, timeout=args.timeout)
+        for _ in range(args.users)
+    ]
+
+    async def limited(coro):
+        async with gate:
+            return await coro
+
+    try:
+        # Sign-ups are bcrypt-bound, so they are a separate phase and don't dilute orders/sec
+        started = time.perf_counter()
+        signed_in = await asyncio.gather(
+            *(limited(sign_in(client, recorder, run_id, i)) for i, client in enumerate(clients))
+        )
+        sign_in_elapsed = time.perf_counter() - started
+
+        shoppers = [client for client, ok in zip(clients, signed_in) if ok]
+        started = time.perf_counter()
+        paid = sum(await asyncio.gather(
+            *(limited(shop(client, recorder, args.orders_per_user, random.Random(rng.random()))) for client in shoppers)
+        ))
+        shop_elapsed = time.perf_counter() - started
+    finally:
+        for client in clients:
+            await client.aclose()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "target": args.url or "in-process",
+        "database_url": None if args.url else os.environ.get("DATABASE_URL"),
+        "config": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "orders_per_user": args.orders_per_user,
+            "items": None if args.url else args.items,
+            "seed": args.seed,
+        },
+        "sign_in_elapsed_s": round(sign_in_elapsed, 3),
+        "users_signed_in": len(shoppers),
+        "elapsed_s": round(shop_elapsed, 3),
+        "orders_paid": paid,
+        "orders_per_sec": round(paid / shop_elapsed, 2) if shop_elapsed else 0.0,
+        "endpoints": recorder.report(),
+    }
+
+def print_report(result: dict, baseline: dict | None = None) -> None:
+    print(
+        f"commit {result['commit']}  target {result['target']}  "
+        f"sign-in {result['sign_in_elapsed_s']} s  ordering {result['elapsed_s']} s"
+    )
+    line = f"orders paid {result['orders_paid']}  orders/sec {result['orders_per_sec']}"
+    if baseline:
+        line += f"  (was {baseline['orders_per_sec']})"
+    print(line)
+    print(f"{'endpoint':<30} {'count':>6} {'5xx':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, stats in result["endpoints"].items():
+        print(
+            f"{label:<30} {stats['count']:>6} {stats['errors']:>5} "
+            f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}"
+        )
+        before = (baseline or {}).get("endpoints", {}).get(label)
+        if before:
+            deltas = "  ".join(
+                f"{key} {stats[key] - before[key]:+.2f}" for key in ("p50_ms", "p95_ms", "p99_ms")
+            )
+            print(f"{'':<30} vs {baseline.get('commit')}: {deltas}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--users", type=int, default=20, help="virtual users (each registers its own account)")
+    parser.add_argument("--concurrency", type=int, help="users active at once (default: all of them)")
+    parser.add_argument("--orders-per-user", type=int, default=5)
+    parser.add_argument("--database-url", help="database for the in-process app (default: a fresh SQLite file)")
+    parser.add_argument("--items", type=int, default=200, help="catalog size for the in-process dataset")
+    parser.add_argument("--stock", type=int, default=100_000, help="stock per item for the in-process dataset")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for item and quantity choices")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--output", default="loadtest-results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="earlier results file to print deltas against")
+    args = parser.parse_args()
+    args.concurrency = args.concurrency or args.users
+
+    if not args.url:
+        # Set before anything imports app.database
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'loadtest.db')}"
+        # Virtual users order back to back, far faster than any person; keep
+        # the per-user limit out of the way so the test measures capacity
+        os.environ.setdefault("ADMISSION_USER_RATE", "0")
+
+    result = asyncio.run(run(args))
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(result, baseline)
+    Path(args.output).write_text(json.dumps(result, indent=2) + "\n")
+    print(f"results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
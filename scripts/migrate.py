@@ -0,0 +1,136 @@
+"""
+Upgrade the database schema in place and check the hot queries' plans.
+
+Usage:
+    python scripts/migrate.py            # apply pending migrations
+    python scripts/migrate.py status     # show current version and pending migrations
+    python scripts/migrate.py explain    # EXPLAIN QUERY PLAN each router query; exit 1 on a table scan
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, func, text, tuple_
+from sqlalchemy.orm import joinedload
+from sqlmodel import select
+
+from app.database import engine
+from app.migrations import LATEST_VERSION, current_version, migrate, pending_migrations
+from app.models import (
+    CartItem,
+    Category,
+    DailyCategorySales,
+    DailyItemSales,
+    DailyPaymentMethodSales,
+    InventoryReservation,
+    Item,
+    Order,
+    OrderItem,
+    Payment,
+    User,
+    UserOrderSummary,
+)
+
+def router_queries() -> dict:
+    """The statements the routers issue on every request, with representative values."""
+    return {
+        "auth: user by email": select(User.id, User.email).where(User.email == "someone@example.com"),
+        "items: categories": select(Category).order_by(Category.name),
+        "items: first page": select(Item).order_by(Item.name, Item.id).limit(25),
+        "items: next page": select(Item)
+        .where(tuple_(Item.name, Item.id) > tuple_("M", 10))
+        .order_by(Item.name, Item.id)
+        .limit(25),
+        "items: category page": select(Item).where(Item.category_id == 1).order_by(Item.name, Item.id).limit(25),
+        "cart: view": select(CartItem).where(CartItem.user_id == 1).options(joinedload(CartItem.item)),
+        "cart: existing line": select(CartItem).where(CartItem.user_id == 1, CartItem.item_id == 1),
+        "cart: clear": delete(CartItem).where(CartItem.user_id == 1),
+        "orders: summary": select(UserOrderSummary).where(UserOrderSummary.user_id == 1),
+        "orders: first page": select(Order)
+        .where(Order.user_id == 1)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(21),
+        "orders: next page": select(Order)
+        .where(Order.user_id == 1, tuple_(Order.created_at, Order.id) < tuple_("2024-06-01 00:00:00", 500))
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(21),
+        "orders: status and date filter": select(Order)
+        .where(Order.user_id == 1, Order.status == "DELIVERED", Order.created_at >= "2024-01-01")
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(21),
+        "orders: detail": select(Order).where(Order.id == 1, Order.user_id == 1),
+        "orders: detail lines": select(OrderItem).where(OrderItem.order_id == 1).options(joinedload(OrderItem.item)),
+        "payment: order lines": select(OrderItem.item_id, OrderItem.quantity).where(OrderItem.order_id == 1),
+        "reservations: due": select(InventoryReservation.order_id)
+        .where(InventoryReservation.expires_at <= "2024-06-01 00:00:00")
+        .order_by(InventoryReservation.expires_at)
+        .limit(500),
+        "reservations: next expiry": select(func.min(InventoryReservation.expires_at)),
+        "reservations: consume": delete(InventoryReservation).where(InventoryReservation.order_id == 1),
+        "payment: latest": select(Payment).where(Payment.order_id == 1).order_by(Payment.created_at.desc()).limit(1),
+        "inventory: import lookup by sku": select(Item).where(Item.sku.in_(["SKU-1", "SKU-2"])),
+        "inventory: import lookup by name": select(Item).where(Item.name.in_(["Apple", "Pear"])),
+        "inventory: held units": select(func.sum(InventoryReservation.quantity)).where(InventoryReservation.item_id == 1),
+        "inventory: export page": select(Item).where(Item.id > 1000).order_by(Item.id).limit(1000),
+        "reports: top items": select(DailyItemSales.item_id, func.sum(DailyItemSales.revenue_cents))
+        .where(DailyItemSales.day.between("2024-06-01", "2024-06-07"))
+        .group_by(DailyItemSales.item_id),
+        "reports: categories": select(DailyCategorySales.category_id, func.sum(DailyCategorySales.revenue_cents))
+        .where(DailyCategorySales.day.between("2024-06-01", "2024-06-07"))
+        .group_by(DailyCategorySales.category_id),
+        "reports: payment methods": select(DailyPaymentMethodSales.payment_method, func.sum(DailyPaymentMethodSales.amount_cents))
+        .where(DailyPaymentMethodSales.day.between("2024-06-01", "2024-06-07"))
+        .group_by(DailyPaymentMethodSales.payment_method),
+    }
+
+def table_scans(plan_rows) -> list[str]:
+    """Plan steps that read a whole table rather than seeking or walking an index."""
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        if detail.startswith("SCAN ") and " USING " not in detail and "VIRTUAL TABLE" not in detail:
+            scans.append(detail)
+    return scans
+
+def explain() -> int:
+    if engine.dialect.name != "sqlite":
+        print("explain: only implemented for SQLite")
+        return 0
+    failures = 0
+    with engine.connect() as conn:
+        for label, stmt in router_queries().items():
+            sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = conn.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+            scans = table_scans(plan)
+            status = "SCAN" if scans else "ok"
+            failures += bool(scans)
+            print(f"[{status:>4}] {label}")
+            for row in plan:
+                print(f"         {row[-1]}")
+    return 1 if failures else 0
+
+def status() -> int:
+    with engine.connect() as conn:
+        version = current_version(conn)
+    pending = pending_migrations(engine)
+    print(f"Schema version {version} (latest {LATEST_VERSION})")
+    for migration in pending:
+        print(f"  pending: {migration.version} {migration.name}")
+    return 0
+
+def upgrade() -> int:
+    applied = migrate(engine)
+    for migration in applied:
+        print(f"Applied {migration.version} {migration.name}")
+    print(f"Schema is at version {LATEST_VERSION}")
+    return 0
+
+COMMANDS = {"upgrade": upgrade, "status": status, "explain": explain}
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command not in COMMANDS:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(COMMANDS[command]())
@@ -1,5 +1,9 @@
+"""
+Seed the five-item demo catalog.
+
+For benchmark- or production-sized data use scripts/generate_data.py instead.
+"""
 import sys
-import os
 import random
 from pathlib import Path
 
@@ -28,26 +32,21 @@ ITEMS = [
 ]
 
 def main():
+    """Idempotently add the small demo catalog: one query per table, one commit."""
     create_db_and_tables()
     with Session(engine) as session:
-        name_to_cat = {}
-        for name, _ in CATEGORIES:
-            if name == "All":
-                continue
-            existing = session.exec(select(Category).where(Category.name == name)).first()
-            if not existing:
-                cat = Category(name=name)
-                session.add(cat)
-                session.commit()
-                session.refresh(cat)
-                name_to_cat[name] = cat
-            else:
-                name_to_cat[name] = existing
-        for name, desc, price, cat_name in ITEMS:
-            cat = name_to_cat.get(cat_name)
-            existing = session.exec(select(Item).where(Item.name == name)).first()
-            if not existing and cat:
-                session.add(Item(name=name, description=desc, price_cents=price, stock=random.randint(5, 30), category_id=cat.id))
+        wanted = [name for name, _ in CATEGORIES if name != "All"]
+        existing = {c.name: c for c in session.exec(select(Category).where(Category.name.in_(wanted)))}
+        session.add_all(Category(name=name) for name in wanted if name not in existing)
+        session.flush()
+        name_to_cat = {c.name: c for c in session.exec(select(Category).where(Category.name.in_(wanted)))}
+
+        existing_items = set(session.exec(select(Item.name).where(Item.name.in_([name for name, *_ in ITEMS]))))
+        session.add_all(
+            Item(name=name, description=desc, price_cents=price, stock=random.randint(5, 30), category_id=name_to_cat[cat_name].id)
+            for name, desc, price, cat_name in ITEMS
+            if name not in existing_items
+        )
         session.commit()
     print("Seed complete.")
 